@@ -3,12 +3,24 @@
 import os
 import logging
 from abc import ABC
+from functools import lru_cache
+from operator import attrgetter
 from tempfile import NamedTemporaryFile
 from urllib.parse import urlparse
 from io import RawIOBase, UnsupportedOperation, SEEK_SET, DEFAULT_BUFFER_SIZE
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
+def parse_uri(uri):
+    """Parses a URI into a 3-tuple of (scheme, hostname, path).
+    The results are cached, since the URI of a StorageFile or StorageFolder
+    is parsed again when the underlying raw object is initialized.
+    """
+    parse_result = urlparse(uri)
+    return parse_result.scheme, parse_result.hostname, parse_result.path
+
+
 class StorageObject:
     """Represents a storage object.
     This is the base class for storage folder and storage file.
@@ -18,8 +30,9 @@ class StorageObject:
         prefix: the prefix of the object, which does not contain the slash at the beginning of the path.
 
     """
-    # Use a large buffer to improve performance of cloud storage access.
-    BUFFER_SIZE = DEFAULT_BUFFER_SIZE * 128
+    # Use a large buffer (1 MiB) to improve performance of cloud storage access.
+    # Local files use the block size of the file system instead, see StorageFile.__buffer_size().
+    BUFFER_SIZE = int(os.environ.get("ARIES_BUFFER_SIZE", DEFAULT_BUFFER_SIZE * 128))
 
     def __init__(self, uri):
         """Initializes a storage object.
@@ -30,11 +43,9 @@ class StorageObject:
 
         See https://en.wikipedia.org/wiki/Uniform_Resource_Identifier
         """
-        self.uri = str(uri)
-        parse_result = urlparse(self.uri)
-        self.scheme = parse_result.scheme
-        self.hostname = parse_result.hostname
-        self.path = parse_result.path
+        uri = str(uri)
+        self.uri = uri
+        self.scheme, self.hostname, self.path = parse_uri(uri)
 
         # Use file as scheme if one is not in the URI
         if not self.scheme:
@@ -92,22 +103,41 @@ class StorageObject:
         if not storage_objects:
             return []
         elif not attribute:
-            return [str(f) for f in storage_objects]
+            return list(map(str, storage_objects))
         else:
-            return [getattr(f, attribute) for f in storage_objects]
+            return list(map(attrgetter(attribute), storage_objects))
 
     @staticmethod
-    def copy_stream(from_file_obj, to_file_obj):
+    def copy_stream(from_file_obj, to_file_obj, buffer=None):
         """Copies data from one file object to another
+
+        Args:
+            from_file_obj: The file object to read from.
+            to_file_obj: The file object to write to.
+            buffer: A bytearray to be reused for the chunks, if from_file_obj supports readinto().
+                A buffer of BUFFER_SIZE will be allocated if buffer is None.
+
+        Returns: The number of bytes copied.
+
         """
         # TODO: there could be a problem if the file_obj has a different buffer size.
         chunk_size = StorageObject.BUFFER_SIZE
         file_size = 0
+        if not hasattr(from_file_obj, "readinto"):
+            while True:
+                b = from_file_obj.read(chunk_size)
+                if not b:
+                    break
+                file_size += to_file_obj.write(b)
+            to_file_obj.flush()
+            return file_size
+        # Read into the same buffer for every chunk instead of allocating new bytes.
+        view = memoryview(buffer if buffer is not None else bytearray(chunk_size))
         while True:
-            b = from_file_obj.read(chunk_size)
-            if not b:
+            n = from_file_obj.readinto(view)
+            if not n:
                 break
-            file_size += to_file_obj.write(b)
+            file_size += to_file_obj.write(view[:n])
         to_file_obj.flush()
         return file_size
 
@@ -134,9 +164,15 @@ class StoragePrefixBase(StorageObject):
 
         Returns: A list of storage file objects.
 
+        """
+        return list(self.iter_objects())
+
+    def iter_objects(self):
+        """Iterates through the storage files under this object without building a list.
         """
         from .io import StorageFile
-        return [StorageFile(uri) for uri in self.uri_list]
+        for uri in self.uri_list:
+            yield StorageFile(uri)
 
     @property
     def uri_list(self):
@@ -158,7 +194,7 @@ class StoragePrefixBase(StorageObject):
 
         """
         total = 0
-        for obj in self.objects:
+        for obj in self.iter_objects():
             s = obj.size
             total += s if s else 0
         return total
@@ -189,6 +225,8 @@ class StorageFolderBase(StorageObject):
         Other methods (raising UnsupportedOperation error) can be implemented optionally to improve the performance:
             objects()
             copy()
+        The following method can also be implemented to list the files and folders together:
+            scan(), returning a 2-tuple of (files, folders)
 
     The io.StorageFolder class contains default implementations for methods like objects() and copy().
     In io.StorageFolder, when these methods are not implemented in the raw class,
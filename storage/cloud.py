@@ -1,8 +1,14 @@
 import os
+import time
+import atexit
 import datetime
 import logging
 import threading
-from io import FileIO
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from io import FileIO, BytesIO
+from queue import Queue, Full
 from abc import ABC
 from .base import StorageObject, StoragePrefixBase, StorageIOSeekable
 logger = logging.getLogger(__name__)
@@ -103,7 +109,142 @@ class CloudStoragePrefix(StoragePrefixBase, ABC):
         raise NotImplementedError()
 
 
+class PrefetchReader:
+    """Reads bytes sequentially from a cloud storage file,
+    while the next chunks are being downloaded in a background thread.
+
+    The background thread does not keep the file or this reader alive.
+    It holds only a weak reference to the bound read_bytes method,
+    and it stops once this reader is garbage collected, e.g. when the file is not closed.
+    """
+    def __init__(self, read_bytes, start, end, chunk_size, depth):
+        """Starts downloading the chunks in a background thread.
+
+        Args:
+            read_bytes: A function reading bytes from position start to position end, inclusive.
+                If it is a bound method, only a weak reference to its object is kept by the thread.
+            start: The position to start reading.
+            end: The last position to be read, inclusive.
+            chunk_size: The number of bytes to be downloaded in each request.
+            depth: The maximum number of chunks to be downloaded ahead.
+        """
+        # The position of the next byte to be returned by read()
+        self.offset = start
+        self.queue = Queue(maxsize=depth)
+        # The current chunk and the position of the next byte to be returned in it.
+        self.buffer = memoryview(b"")
+        self.buffer_pos = 0
+        self.eof = False
+        self.stopped = threading.Event()
+        if hasattr(read_bytes, "__self__"):
+            read_ref = weakref.WeakMethod(read_bytes)
+        else:
+            read_ref = lambda: read_bytes
+        # The thread target is not a method, so that the thread does not reference this reader.
+        self.thread = threading.Thread(
+            target=self.download, args=(read_ref, self.queue, self.stopped, start, end, chunk_size)
+        )
+        self.thread.daemon = True
+        # Stop the thread when this reader is garbage collected.
+        weakref.finalize(self, self.stopped.set)
+        self.thread.start()
+
+    @staticmethod
+    def download(read_ref, queue, stopped, start, end, chunk_size):
+        """Downloads the chunks into the queue until the end position, or until stopped is set.
+
+        Args:
+            read_ref: A function returning the read_bytes function, or None if its object is garbage collected.
+            queue: The queue for the downloaded chunks.
+            stopped: A threading.Event to stop the download.
+
+        """
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    queue.put(item, timeout=1)
+                    return
+                except Full:
+                    continue
+
+        pos = start
+        try:
+            while pos <= end and not stopped.is_set():
+                read_bytes = read_ref()
+                if read_bytes is None:
+                    return
+                chunk_end = min(pos + chunk_size - 1, end)
+                chunk = read_bytes(pos, chunk_end)
+                # Do not keep the file alive while waiting for the queue.
+                del read_bytes
+                put(chunk)
+                pos = chunk_end + 1
+        except Exception as ex:
+            # The exception will be raised by read()
+            put(ex)
+        # None indicates the end of the file
+        put(None)
+
+    def read(self, size=None):
+        """Reads at most size bytes. Reads until the end of the file if size is None.
+        """
+        chunks = []
+        count = 0
+        while size is None or count < size:
+            available = len(self.buffer) - self.buffer_pos
+            if not available:
+                if self.eof:
+                    break
+                item = self.queue.get()
+                if item is None:
+                    self.eof = True
+                    break
+                if isinstance(item, Exception):
+                    self.stop()
+                    raise item
+                self.buffer = memoryview(item)
+                self.buffer_pos = 0
+                continue
+            n = available if size is None else min(size - count, available)
+            # Slicing the memoryview does not copy the rest of the chunk.
+            chunks.append(self.buffer[self.buffer_pos:self.buffer_pos + n])
+            self.buffer_pos += n
+            count += n
+        self.offset += count
+        return b"".join(chunks)
+
+    def stop(self):
+        """Stops the background download.
+        """
+        self.stopped.set()
+
+
 class CloudStorageIO(StorageIOSeekable):
+    # The size of each chunk to be downloaded in the background when the file is read sequentially.
+    PREFETCH_CHUNK_SIZE = 4 * 1024 * 1024
+    # The maximum number of chunks to be downloaded ahead. Prefetching is disabled if this is 0.
+    PREFETCH_DEPTH = 0
+    # The local copy is kept in memory until it is larger than this size, then it is moved to a temp file.
+    SPOOL_MAX_SIZE = 8 * 1024 * 1024
+    # Check the existence of the file with a separate request before reading it.
+    # When this is False, the size request of the first read tells whether the file exists.
+    PRECHECK_EXISTS = False
+    # Send a second identical ranged request if the first one is slower than
+    # the 95th percentile of the recent reads, and use the response arriving first.
+    # This is disabled by default as it sends extra requests.
+    HEDGE_READS = False
+    # The number of recent reads needed before hedging starts.
+    HEDGE_MIN_SAMPLES = 20
+    # The maximum number of recent reads kept for each class and size bucket.
+    HEDGE_MAX_SAMPLES = 200
+    # Durations of the recent ranged reads in seconds, keyed by (class, size bucket), see get_read_durations().
+    # Reads from different storages or of very different sizes are not compared with each other.
+    read_durations = dict()
+    read_durations_lock = threading.Lock()
+    # Thread pool for sending the hedged requests, created on first use and shut down at exit.
+    hedge_executor = None
+    hedge_executor_lock = threading.Lock()
+
     def __init__(self, uri):
         """
         """
@@ -112,47 +253,106 @@ class CloudStorageIO(StorageIOSeekable):
         # Path of the temp local file
         self.temp_path = None
 
-        # Stores the temp local FileIO object
+        # Stores the local copy, as a BytesIO in memory or a FileIO of the temp file.
         self.__file_io = None
 
         # Cache the size information
         # TODO: use cached property
         self.__size = None
 
+        # Background reader for sequential reads, see __prefetch()
+        self.__prefetcher = None
+        # The end position of the last read, used to detect sequential reads.
+        self.__read_end = None
+        # The size of the remote file, when the local file contains only the data appended to it.
+        # See local() and close().
+        self.__append_base = 0
+
     @property
     def size(self):
-        if not self.__size:
-            if self.__file_io:
-                return os.fstat(self.__file_io.fileno).st_size
+        if self.__file_io:
+            # The local copy contains the latest data.
+            return self.__append_base + self.__local_size()
+        if self.__size is None:
             self.__size = self.get_size()
         return self.__size
 
     def seek(self, pos, whence=0):
         if self.__file_io:
-            self._offset = self.__file_io.seek(pos, whence)
+            if whence == 0:
+                pos = max(0, pos - self.__append_base)
+            self._offset = self.__append_base + self.__file_io.seek(pos, whence)
             return self._offset
-        return self._seek(pos, whence)
+        offset = self._seek(pos, whence)
+        if self.__prefetcher and self.__prefetcher.offset != offset:
+            self.__stop_prefetch()
+        return offset
+
+    def __stop_prefetch(self):
+        if self.__prefetcher:
+            self.__prefetcher.stop()
+            self.__prefetcher = None
+
+    def __prefetch(self, start, file_size):
+        """Gets the background reader for reading from the start position.
+        The background reader is started only when the file is being read sequentially,
+        i.e. the read starts from the end of the last read.
+        Returns None if the data should be read directly.
+        """
+        if self.__prefetcher and self.__prefetcher.offset == start:
+            return self.__prefetcher
+        self.__stop_prefetch()
+        if self.PREFETCH_DEPTH and start == self.__read_end:
+            self.__prefetcher = PrefetchReader(
+                self.hedged_read_bytes, start, file_size - 1, self.PREFETCH_CHUNK_SIZE, self.PREFETCH_DEPTH
+            )
+        return self.__prefetcher
 
     def tell(self):
         if self.__file_io:
-            self._offset = self.__file_io.tell()
+            self._offset = self.__append_base + self.__file_io.tell()
         return self._offset
 
+    def __local_size(self):
+        if isinstance(self.__file_io, BytesIO):
+            with self.__file_io.getbuffer() as view:
+                return view.nbytes
+        return os.fstat(self.__file_io.fileno()).st_size
+
     def local(self):
         """Creates a local copy of the file.
+        The local copy is kept in memory and moved to a temp file once it is larger than SPOOL_MAX_SIZE.
         """
         if not self.__file_io:
-            file_obj = self.create_temp_file()
+            file_obj = BytesIO()
             # Download file if appending or updating
-            if self.exists() and ('a' in self.mode or '+' in self.mode):
-                self.download(file_obj)
-            # Close the temp file and open it with FileIO
-            file_obj.close()
-            mode = "".join([c for c in self.mode if c in "rw+ax"])
-            self.__file_io = FileIO(file_obj.name, mode)
-            self.temp_path = file_obj.name
+            # Check the mode first so that no request is sent for writing.
+            if ('a' in self.mode or '+' in self.mode) and self.exists():
+                if '+' not in self.mode and hasattr(self, "upload_append"):
+                    # The file will not be read, keep only the appended data locally.
+                    # The data will be appended to the remote file by upload_append() on close().
+                    self.__append_base = self.size
+                else:
+                    self.download(file_obj)
+            self.__file_io = file_obj
+            self.__rollover()
+            # Keep the current position
+            self.__file_io.seek(max(0, self._offset - self.__append_base))
         return self
 
+    def __rollover(self):
+        """Moves the local copy from memory to a temp file, if it is larger than SPOOL_MAX_SIZE.
+        """
+        if not isinstance(self.__file_io, BytesIO) or self.__local_size() <= self.SPOOL_MAX_SIZE:
+            return
+        file_obj = self.create_temp_file()
+        file_obj.write(self.__file_io.getvalue())
+        file_obj.close()
+        pos = self.__file_io.tell()
+        self.__file_io = FileIO(file_obj.name, "r+")
+        self.__file_io.seek(pos)
+        self.temp_path = file_obj.name
+
     def read(self, size=None):
         """Reads the file from the Google Cloud bucket to memory
 
@@ -163,10 +363,12 @@ class CloudStorageIO(StorageIOSeekable):
             self.__file_io.seek(start)
             b = self.__file_io.read(size)
         else:
-            if not self.exists():
+            if self.PRECHECK_EXISTS and not self.exists():
                 raise FileNotFoundError("File %s does not exists." % self.uri)
             file_size = self.size
-            # TODO: size unknown?
+            # get_size() returns None if the file does not exist.
+            if file_size is None:
+                raise FileNotFoundError("File %s does not exists." % self.uri)
             if not file_size:
                 return b""
             if start >= file_size:
@@ -176,8 +378,13 @@ class CloudStorageIO(StorageIOSeekable):
                 end = start + size - 1
             if end > file_size - 1:
                 end = file_size - 1
-            # logger.debug("Reading from %s to %s" % (start, end))
-            b = self.read_bytes(start, end)
+            prefetcher = self.__prefetch(start, file_size)
+            if prefetcher:
+                b = prefetcher.read(end - start + 1)
+            else:
+                # logger.debug("Reading from %s to %s" % (start, end))
+                b = self.hedged_read_bytes(start, end)
+            self.__read_end = start + len(b)
         self._offset += len(b)
         return b
 
@@ -195,15 +402,16 @@ class CloudStorageIO(StorageIOSeekable):
         # Create a temp local file
         self.local()
         # Write data from buffer to file
-        self.__file_io.seek(self.tell())
+        self.__file_io.seek(self.tell() - self.__append_base)
         size = self.__file_io.write(b)
         self._offset += size
+        self.__rollover()
         return size
 
     def __rm_temp(self):
         if self.temp_path and os.path.exists(self.temp_path):
             os.unlink(self.temp_path)
-        logger.debug("Deleted temp file %s of %s" % (self.temp_path, self.uri))
+        logger.debug("Deleted temp file %s of %s", self.temp_path, self.uri)
         self.temp_path = None
         return
 
@@ -229,20 +437,30 @@ class CloudStorageIO(StorageIOSeekable):
         This method has no effect if the file is already closed.
         """
 
+        self.__stop_prefetch()
         if self._closed:
             return
 
         if self.__file_io:
-            if not self.__file_io.closed:
-                self.__file_io.close()
+            file_obj = self.__file_io
+            # The uploaded file has the same size as the local copy.
+            self.__size = self.__append_base + self.__local_size()
             self.__file_io = None
-
-        if self.temp_path:
-            logger.debug("Uploading file to %s" % self.uri)
-            with open(self.temp_path, 'rb') as f:
-                self.upload(f)
+            if self.temp_path:
+                file_obj.close()
+                file_obj = open(self.temp_path, 'rb')
+            else:
+                file_obj.seek(0)
+            logger.debug("Uploading file to %s", self.uri)
+            with file_obj:
+                if self.__append_base:
+                    self.upload_append(file_obj)
+                else:
+                    self.upload(file_obj)
+            self.__append_base = 0
             # Remove __temp_file if it exists.
-            self.__rm_temp()
+            if self.temp_path:
+                self.__rm_temp()
             # Set _closed attribute
             self._closed = True
 
@@ -272,3 +490,89 @@ class CloudStorageIO(StorageIOSeekable):
         """Reads bytes from position start to position end, inclusive
         """
         raise NotImplementedError()
+
+    def hedged_read_bytes(self, start, end):
+        """Reads bytes from position start to position end, inclusive, with read_bytes().
+        If HEDGE_READS is True, a second identical request is sent when the first one takes longer than
+        the 95th percentile of the recent reads. The data from the request finishing first is returned.
+        """
+        if not self.HEDGE_READS:
+            return self.read_bytes(start, end)
+        durations = self.get_read_durations(end - start + 1)
+        samples = sorted(durations)
+        if len(samples) < self.HEDGE_MIN_SAMPLES:
+            data, duration = self.timed_read_bytes(start, end)
+        else:
+            executor = self.get_hedge_executor()
+            futures = [executor.submit(self.timed_read_bytes, start, end)]
+            if not wait(futures, timeout=samples[int(len(samples) * 0.95)]).done:
+                logger.debug("Hedging the read of %s from %s to %s", self.uri, start, end)
+                futures.append(executor.submit(self.timed_read_bytes, start, end))
+            data, duration = self.__first_result(futures)
+        # Record the duration of the request returning the data, excluding the time waiting before hedging.
+        durations.append(duration)
+        return data
+
+    def timed_read_bytes(self, start, end):
+        """Reads bytes with read_bytes() and measures the duration.
+
+        Returns: A 2-tuple of (data, duration in seconds)
+        """
+        started = time.monotonic()
+        data = self.read_bytes(start, end)
+        return data, time.monotonic() - started
+
+    @classmethod
+    def get_read_durations(cls, size):
+        """Gets the durations of the recent reads from this class, having about the same size.
+        The reads are grouped by the number of bits of the size, i.e. within a factor of 2.
+
+        Returns: A deque of durations in seconds.
+        """
+        key = (cls, size.bit_length())
+        durations = cls.read_durations.get(key)
+        if durations is None:
+            with cls.read_durations_lock:
+                durations = cls.read_durations.setdefault(key, deque(maxlen=cls.HEDGE_MAX_SAMPLES))
+        return durations
+
+    @staticmethod
+    def __first_result(futures):
+        """Returns the result of the future finishing first without an exception.
+        The exception of the last future is raised if all of them failed.
+        The other futures are cancelled if they are not started yet.
+        A request already running cannot be interrupted, its result will be discarded.
+        """
+        error = None
+        try:
+            for future in as_completed(futures):
+                try:
+                    return future.result()
+                except Exception as ex:
+                    error = ex
+            raise error
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def get_hedge_executor():
+        """Gets the thread pool for sending the hedged requests, shared by all files.
+        """
+        with CloudStorageIO.hedge_executor_lock:
+            if CloudStorageIO.hedge_executor is None:
+                CloudStorageIO.hedge_executor = ThreadPoolExecutor(max_workers=32)
+                atexit.register(CloudStorageIO.shutdown_hedge_executor)
+            return CloudStorageIO.hedge_executor
+
+    @staticmethod
+    def shutdown_hedge_executor():
+        """Shuts down the thread pool for sending the hedged requests.
+        A new thread pool will be created by the next hedged read.
+        """
+        with CloudStorageIO.hedge_executor_lock:
+            executor = CloudStorageIO.hedge_executor
+            CloudStorageIO.hedge_executor = None
+        if executor is not None:
+            atexit.unregister(CloudStorageIO.shutdown_hedge_executor)
+            executor.shutdown(wait=False)
@@ -1,4 +1,5 @@
 import os
+import errno
 import shutil
 import logging
 import datetime
@@ -17,13 +18,70 @@ class LocalFolder(StorageFolderBase):
     def object_paths(self):
         return [os.path.join(self.path, f) for f in os.listdir(self.path)]
 
+    def iter_entries(self):
+        """Gets the os.DirEntry objects of the files and folders in this folder.
+        The entries cache the file type, so that checking for files and folders does not need os.stat().
+        """
+        with os.scandir(self.path) as entries:
+            return list(entries)
+
+    def first_child(self):
+        """Gets the name of a file or sub-folder in this folder, without listing the whole folder.
+
+        Returns: A name, or None if the folder is empty.
+        """
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                return entry.name
+        return None
+
     @property
     def file_paths(self):
-        return list(filter(lambda x: os.path.isfile(x), self.object_paths))
+        return self.list_paths()[0]
 
     @property
     def folder_paths(self):
-        return list(filter(lambda x: os.path.isdir(x), self.object_paths))
+        return self.list_paths()[1]
+
+    def scan(self):
+        """Lists the files and the sub-folders in the directory with a single os.scandir() call.
+
+        Returns: A 2-tuple of (files, folders), a list of StorageFiles and a list of StorageFolders.
+        """
+        from .io import StorageFile, StorageFolder
+        file_paths, folder_paths = self.list_paths()
+        return [StorageFile(p) for p in file_paths], [StorageFolder(p) for p in folder_paths]
+
+    def list_paths(self):
+        """Lists the paths of the files and the sub-folders in the directory with a single os.scandir() call.
+
+        Returns: A 2-tuple of (file_paths, folder_paths)
+        """
+        file_paths = []
+        folder_paths = []
+        for entry in self.iter_entries():
+            if entry.is_file():
+                file_paths.append(entry.path)
+            elif entry.is_dir():
+                folder_paths.append(entry.path)
+        return file_paths, folder_paths
+
+    @property
+    def size(self):
+        """The size in bytes of all files in the folder and sub-folders.
+        Symbolic links are not followed, each link is counted by its own size.
+        """
+        total = 0
+        # Walk the sub-folders with a stack instead of recursion.
+        stack = [self.path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+        return total
 
     def create(self):
         if not os.path.exists(self.path):
@@ -49,12 +107,13 @@ class LocalFolder(StorageFolderBase):
         if not os.path.exists(local_path):
             logger.debug("Creating new folder: %s" % local_path)
             os.makedirs(local_path)
-        for file_path in self.file_paths:
+        file_paths, folder_paths = self.list_paths()
+        for file_path in file_paths:
             logger.debug("Copying %s" % file_path)
             # Copy the file into the directory
             shutil.copy(file_path, local_path)
 
-        for folder_path in self.folder_paths:
+        for folder_path in folder_paths:
             LocalFolder(folder_path).copy(to)
 
     def delete(self):
@@ -132,8 +191,40 @@ class LocalFile(StorageIOSeekable):
 
     def copy(self, to):
         """Copies the file to another location.
+        The data is copied within the kernel by copy_file_range() if it is available,
+        which also allows the file system to share the data blocks (reflink) instead of copying them.
+        Otherwise, shutil.copyfile() is used, which copies with sendfile() on Linux.
+        """
+        dest_path = LocalFile(to).path
+        if hasattr(os, "copy_file_range"):
+            try:
+                self.copy_file_range(dest_path)
+                return
+            except OSError as ex:
+                # The file system does not support copy_file_range(), or the files are on different devices.
+                if ex.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise ex
+                logger.debug("copy_file_range() failed for %s: %s", self.path, ex)
+        shutil.copyfile(self.path, dest_path)
+
+    def copy_file_range(self, dest_path):
+        """Copies the file to dest_path with os.copy_file_range(), without reading the data into Python.
+
+        Returns: The number of bytes copied.
         """
-        shutil.copyfile(self.path, LocalFile(to).path)
+        # Opening the destination would truncate the source if they are the same file.
+        if os.path.exists(dest_path) and os.path.samefile(self.path, dest_path):
+            raise shutil.SameFileError("%s and %s are the same file." % (self.path, dest_path))
+        copied = 0
+        with open(self.path, "rb") as src, open(dest_path, "wb") as dst:
+            size = os.fstat(src.fileno()).st_size
+            # The file may grow while being copied, copy until the end of the file.
+            while True:
+                n = os.copy_file_range(src.fileno(), dst.fileno(), max(size - copied, 1024 * 1024 * 1024))
+                if not n:
+                    break
+                copied += n
+        return copied
 
     def open(self, mode='r', closefd=True, opener=None):
         """
@@ -17,38 +17,118 @@ See Also:
 
 """
 import os
+import math
+import uuid
+import time
+import random
 import logging
 import warnings
 import tempfile
 import base64
+import hashlib
 import binascii
+import threading
+import itertools
+from urllib.parse import urlparse
+from io import BytesIO
 from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import urllib3
+import google.auth
+from requests.adapters import HTTPAdapter
+from google.auth.transport.requests import AuthorizedSession
+from google.api_core.retry import Retry, if_exception_type
 from google.cloud import storage
-from google.cloud.exceptions import ServerError, Forbidden
+from google.cloud.storage import transfer_manager
+from google.cloud.storage.retry import DEFAULT_RETRY
+from google.cloud.exceptions import ServerError, TooManyRequests, NotFound, PreconditionFailed
 from ..strings import Base64String
-from ..tasks import FunctionTask
 from .base import StorageFolderBase
 from .cloud import BucketStorageObject, CloudStoragePrefix, CloudStorageIO
 logger = logging.getLogger(__name__)
+# Ignore the warnings from Google Cloud libraries once at import time,
+# instead of catching the warnings in every API call.
+warnings.filterwarnings("ignore", category=ResourceWarning)
+warnings.filterwarnings("ignore", category=UserWarning, module=r"google\.")
+# Exceptions to be retried by api_call()
+# ServerError includes InternalServerError, ServiceUnavailable and GatewayTimeout (5xx).
+# TooManyRequests (429) is returned when the request rate limit is exceeded.
+# Connections dropped by the server while idle in the pool will raise ConnectionError.
+RETRY_EXCEPTIONS = (
+    ServerError, TooManyRequests, requests.exceptions.ConnectionError, requests.exceptions.Timeout
+)
+# Retry policy for listing requests.
+# Each page request is retried individually, so that a failure will not restart the whole listing.
+LIST_RETRY = Retry(initial=1.0, maximum=16.0, multiplier=2.0, predicate=if_exception_type(*RETRY_EXCEPTIONS))
 
 
 def setup_credentials(env_name, to_json_file=None):
     """Configures the GOOGLE_APPLICATION_CREDENTIALS
     by saving the value of an environment variable to a JSON file.
+
+    If to_json_file is None, the file will be saved in the temp directory,
+    named by the hash of the credentials, so that the file can be reused by other processes.
     """
     # Use the b64 encoded content as credentials if "GOOGLE_CREDENTIALS" is set.
     credentials = os.environ.get(env_name)
     if credentials and credentials.startswith("ew"):
         if not to_json_file:
-            temp_file = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
-            temp_file.close()
-            to_json_file = temp_file.name
-        Base64String(credentials).decode_to_file(to_json_file)
+            digest = hashlib.blake2b(credentials.encode()).hexdigest()[:16]
+            to_json_file = os.path.join(tempfile.gettempdir(), "gcp_credentials_%s.json" % digest)
+            # The file with the same name has the same credentials.
+            # Reuse the file only if it is created by the same user.
+            if not (os.path.isfile(to_json_file) and os.stat(to_json_file).st_uid == os.getuid()):
+                # Write to a private temp file first, then move it to the final location atomically.
+                fd, temp_path = tempfile.mkstemp(suffix=".json")
+                os.close(fd)
+                Base64String(credentials).decode_to_file(temp_path)
+                os.replace(temp_path, to_json_file)
+        elif os.environ.get("GOOGLE_APPLICATION_CREDENTIALS") != to_json_file or not os.path.exists(to_json_file):
+            Base64String(credentials).decode_to_file(to_json_file)
     # Set "GOOGLE_APPLICATION_CREDENTIALS" if json file exists.
-    if os.path.exists(to_json_file):
+    if to_json_file and os.path.exists(to_json_file):
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = to_json_file
 
 
+class RetryThrottle:
+    """Tracks the failures of the API calls from all threads in the process,
+    so that the threads back off together when the server is overloaded.
+
+    Each failure takes one token and each successful call returns token_ratio token, up to max_tokens.
+    The retries are throttled when the tokens are not more than half of max_tokens.
+
+    See Also:
+        https://github.com/grpc/proposal/blob/master/A6-client-retries.md#throttling-retry-attempts-and-hedged-rpcs
+    """
+    def __init__(self, max_tokens=100, token_ratio=0.1):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+
+    def on_success(self):
+        # Skip the lock when there is no failure recently.
+        if self.tokens >= self.max_tokens:
+            return
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.token_ratio)
+
+    def on_failure(self):
+        """Records a failure.
+
+        Returns: True if the retries should be throttled, otherwise False.
+        """
+        with self.lock:
+            self.tokens = max(0, self.tokens - 1)
+            return self.tokens <= self.max_tokens / 2
+
+
+# The retry throttle shared by all API calls in the process.
+RETRY_THROTTLE = RetryThrottle()
+
+
 def api_call(func=None, *args, **kwargs):
     """Makes API call and retry if there is an exception.
     This is designed to resolve the 500 Backend Error from Google.
@@ -59,21 +139,48 @@ def api_call(func=None, *args, **kwargs):
     Examples:
         api_call(self.bucket.get_blob, self.prefix)
 
-    See Also: https://developers.google.com/drive/api/v3/handle-errors#resolve_a_500_error_backend_error
+    See Also:
+        https://developers.google.com/drive/api/v3/handle-errors#resolve_a_500_error_backend_error
+        https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
     """
     if not func:
         return None
-        # logger.debug("Making API call: %s..." % func.__name__)
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore", ResourceWarning)
-        warnings.simplefilter("ignore", UserWarning)
-        return FunctionTask(func, *args, **kwargs).run_and_retry(
-            max_retry=3,
-            exceptions=ServerError,
-            base_interval=60,
-            retry_pattern='linear',
-            capture_output=False
-        )
+    max_retry = 6
+    base_interval = 1
+    max_interval = 32
+    # Call the function directly so that there is no additional overhead when the call succeeds.
+    for i in range(max_retry):
+        try:
+            results = func(*args, **kwargs)
+        except RETRY_EXCEPTIONS as ex:
+            throttled = RETRY_THROTTLE.on_failure()
+            if i + 1 >= max_retry:
+                raise ex
+            # Exponential backoff with full jitter,
+            # so that the retries from different clients will not hit the server at the same time.
+            # When many calls in the process are failing, all threads wait up to the max interval.
+            backoff = max_interval if throttled else min(max_interval, base_interval * 2 ** i)
+            interval = random.uniform(0, backoff)
+            logger.warning(
+                "%s, retry %d of %d in %.1f seconds%s...",
+                ex, i + 1, max_retry - 1, interval, " (throttled)" if throttled else ""
+            )
+            time.sleep(interval)
+        else:
+            RETRY_THROTTLE.on_success()
+            return results
+
+
+def parse_gs_uri(uri):
+    """Gets the bucket name and the prefix from a Google Cloud Storage URI, without initializing a GSObject.
+
+    Args:
+        uri: A Google Cloud Storage URI, e.g. "gs://bucket_name/path/to/file".
+
+    Returns: A 2-tuple of (bucket_name, prefix). The prefix does not include the beginning "/".
+    """
+    parse_result = urlparse(str(uri))
+    return parse_result.hostname, parse_result.path.lstrip("/")
 
 
 def api_decorator(method):
@@ -93,10 +200,97 @@ def api_decorator(method):
     return wrapper
 
 
+class BufferWriter:
+    """A file-like object writing the data into a preallocated bytearray.
+    """
+    def __init__(self, size):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.position = 0
+
+    def write(self, b):
+        # Slice a memoryview so that the data is not copied before being written into the buffer.
+        b = memoryview(b).cast("B")
+        n = len(b)
+        # Number of bytes fitting into the preallocated buffer
+        fit = min(n, len(self.buffer) - self.position)
+        self.view[self.position:self.position + fit] = b[:fit]
+        if fit < n:
+            # Grow the buffer if the server returns more data than expected.
+            self.view.release()
+            self.buffer.extend(b[fit:])
+            self.view = memoryview(self.buffer)
+        self.position += n
+        return n
+
+    def getvalue(self):
+        """Returns a memoryview of the data written so far, without copying the data.
+        """
+        return self.view[:self.position]
+
+
+class FileRange:
+    """A read-only file-like object exposing a range of a file, with positions relative to the start of the range.
+    Resumable uploads require the stream to be at position 0, and they seek the stream to resume an upload.
+    """
+    def __init__(self, file_obj, start, size):
+        self.file_obj = file_obj
+        self.start = start
+        self.size = size
+        self.position = 0
+        file_obj.seek(start)
+
+    def read(self, size=-1):
+        remaining = self.size - self.position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        b = self.file_obj.read(size)
+        self.position += len(b)
+        return b
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.size
+        self.position = max(0, min(offset, self.size))
+        self.file_obj.seek(self.start + self.position)
+        return self.position
+
+
 class GSObject(BucketStorageObject):
     """The base class for Google Storage Object.
     """
-    MAX_BATCH_SIZE = 900
+    # GCS accepts at most 100 calls in a single batch request.
+    # See https://cloud.google.com/storage/docs/batch#overview
+    MAX_BATCH_SIZE = 100
+    # Partial response fields for listing blobs when only the names are needed.
+    # See https://cloud.google.com/storage/docs/json_api#partial-response
+    NAME_FIELDS = "items(name),prefixes,nextPageToken"
+    # Partial response fields for listing only the sub-folders (prefixes), without the blobs.
+    PREFIX_FIELDS = "prefixes,nextPageToken"
+    # The maximum number of batch requests to be sent concurrently.
+    MAX_CONCURRENCY = 16
+    # The maximum number of threads for sending individual requests concurrently.
+    MAX_WORKERS = 64
+    # Stores a client for each thread sending batch requests.
+    # The deferred requests in a batch are tracked by the client, so a client cannot be shared by threads.
+    _thread_local = threading.local()
+    # Stores the blobs loaded by get_blob() and the time they are loaded, keyed by (bucket_name, prefix).
+    # The cache is shared by all objects in the process, so that the metadata is not requested repeatedly.
+    # It is used only when BLOB_CACHE_TTL is greater than 0.
+    blob_cache = OrderedDict()
+    blob_cache_lock = threading.Lock()
+    # The maximum number of blobs in the cache. The least recently used blob will be removed.
+    MAX_CACHED_BLOBS = 16384
+    # The number of seconds before a cached blob expires.
+    # A cached blob pins the generation of the object, e.g. in its media link,
+    # so a new object will not see the changes made by other processes until the blob expires.
+    # Defaults to 0, i.e. the metadata is loaded by each object and kept for the lifetime of the object.
+    BLOB_CACHE_TTL = float(os.environ.get("ARIES_GS_BLOB_CACHE_TTL", 0))
 
     @property
     def blob(self):
@@ -104,16 +298,24 @@ class GSObject(BucketStorageObject):
 
         Returns: A Google Cloud Storage Blob object.
 
+        This does not send any request, unless the blob is already cached with the metadata.
+        The blob may not have the metadata, use load_blob() to get the blob with the metadata.
         This does not check whether the object exists.
         Use blob.exists() to determine whether or not the blob exists.
 
         """
         if self._blob is None:
-            # logger.debug("Getting blob: %s" % self.uri)
-            # The following line will avoid sending a GET request
-            # but bucket object will not have the real metadata
-            bucket = self.client.bucket(self.bucket_name)
-            file_blob = api_call(bucket.get_blob, self.prefix)
+            key = (self.bucket_name, self.prefix)
+            file_blob = None
+            if self.BLOB_CACHE_TTL > 0:
+                with self.blob_cache_lock:
+                    cached = self.blob_cache.get(key)
+                    if cached is not None:
+                        if time.monotonic() - cached[1] < self.BLOB_CACHE_TTL:
+                            file_blob = cached[0]
+                            self.blob_cache.move_to_end(key)
+                        else:
+                            del self.blob_cache[key]
             if file_blob is None:
                 # The following will not make an HTTP request.
                 # It simply instantiates a blob object owned by this bucket.
@@ -123,21 +325,86 @@ class GSObject(BucketStorageObject):
             self._blob = file_blob
         return self._blob
 
+    def load_blob(self):
+        """Gets the blob with the metadata.
+        The metadata is requested only if it is not loaded yet or the blob did not exist.
+
+        Returns: A Google Cloud Storage Blob object.
+            The generation of the blob will be None if the blob does not exist.
+
+        """
+        if self.blob.generation is None:
+            self.reload_blob()
+        return self._blob
+
+    def reload_blob(self):
+        """Requests the metadata of the blob, bypassing the cache.
+
+        Returns: A Google Cloud Storage Blob object.
+            The generation of the blob will be None if the blob does not exist.
+
+        """
+        # logger.debug("Getting blob: %s" % self.uri)
+        file_blob = api_call(self.bucket.get_blob, self.prefix)
+        if file_blob is None:
+            self.invalidate()
+            return self.blob
+        self._blob = file_blob
+        if self.BLOB_CACHE_TTL <= 0:
+            return self._blob
+        # Only existing blobs are cached, so that blobs created later will be found.
+        key = (self.bucket_name, self.prefix)
+        with self.blob_cache_lock:
+            self.blob_cache[key] = (file_blob, time.monotonic())
+            self.blob_cache.move_to_end(key)
+            if len(self.blob_cache) > self.MAX_CACHED_BLOBS:
+                self.blob_cache.popitem(last=False)
+        return self._blob
+
+    def invalidate(self):
+        """Discards the cached blob of this object, after the blob is changed or deleted.
+        """
+        self._blob = None
+        self.uncache_blob(self.bucket_name, self.prefix)
+
+    @classmethod
+    def uncache_blob(cls, bucket_name, blob_name):
+        """Discards a blob from the cache.
+        """
+        with cls.blob_cache_lock:
+            cls.blob_cache.pop((bucket_name, blob_name), None)
+
+    @classmethod
+    def invalidate_prefix(cls, bucket_name, prefix):
+        """Discards the cached blobs having the prefix in the bucket.
+        """
+        with cls.blob_cache_lock:
+            keys = [key for key in cls.blob_cache if key[0] == bucket_name and key[1].startswith(prefix)]
+            for key in keys:
+                del cls.blob_cache[key]
+
     @api_decorator
     def init_client(self):
-        return storage.Client()
+        """Initializes a client with a larger HTTP connection pool.
+        The default pool keeps only 10 connections,
+        which will be re-created repeatedly when requests are sent concurrently.
+        """
+        credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+        session = AuthorizedSession(credentials)
+        # Retries are handled by api_call() and the client library, not by urllib3.
+        session.mount("https://", HTTPAdapter(
+            pool_connections=self.MAX_WORKERS, pool_maxsize=self.MAX_WORKERS, pool_block=False,
+            max_retries=urllib3.util.Retry(total=0, read=False)
+        ))
+        return storage.Client(project=project, credentials=credentials, _http=session)
 
-    @api_decorator
     def init_bucket(self):
-        try:
-            # The get_bucket() method requires permission to access the bucket.
-            # The permission is not needed for getting the size or downloading the file.
-            bucket = self.client.get_bucket(self.bucket_name)
-        except Forbidden:
-            # Fallback to initializing a bucket object without sending GET request
-            logger.debug("Account does not have permission to access bucket: %s" % self.bucket_name)
-            bucket = self.client.bucket(self.bucket_name)
-        return bucket
+        """Initializes a bucket object without sending a GET request.
+        The bucket metadata is not used by the storage operations.
+        This also avoids requiring the permission to access the bucket metadata,
+        which is not needed for listing, reading or writing the blobs.
+        """
+        return self.client.bucket(self.bucket_name)
 
     @property
     def gs_path(self):
@@ -157,12 +424,18 @@ class GSObject(BucketStorageObject):
             Blob: The Google Cloud Storage blob.
         """
         blob = storage.Blob(self.prefix, self.bucket)
-        if not blob.exists():
-            blob.upload_from_string("")
+        # if_generation_match=0 lets GCS create the blob only if it does not exist,
+        # without sending another request to check the existence.
+        try:
+            blob.upload_from_string("", if_generation_match=0)
+        except PreconditionFailed:
+            logger.debug("Blob %s already exists.", self.uri)
+        self.invalidate()
         return blob
 
     def delete(self):
         self.delete_blob(self.blob)
+        self.invalidate()
 
     def copy(self, to):
         self.copy_blob(self.blob, to)
@@ -172,70 +445,142 @@ class GSObject(BucketStorageObject):
 
         Args:
             blob: A Google Cloud Storage Blob object in the bucket.
-            to: URI of the new blob (gs://...).
+            to: URI of the new blob (gs://...), or a GSObject initialized with the URI.
 
         Returns: True if the blob is copied. Otherwise False.
 
         """
-        destination = GSObject(to)
-        new_name = str(blob.name).replace(self.prefix, destination.prefix, 1)
-        if new_name != str(blob.name) or self.bucket_name != destination.bucket_name:
-            self.bucket.copy_blob(blob, destination.bucket, new_name)
-            return True
-        return False
+        destination = to if isinstance(to, GSObject) else GSObject(to)
+        # Copying to the same location is skipped.
+        if self.prefix == destination.prefix and self.bucket_name == destination.bucket_name:
+            return False
+        # The blobs of this object always start with the prefix.
+        # Replace only the leading prefix, the same string may also appear later in the name.
+        new_name = destination.prefix + blob.name[len(self.prefix):]
+        self.rewrite_blob(blob, destination.bucket, new_name)
+        self.uncache_blob(destination.bucket_name, new_name)
+        return True
+
+    @staticmethod
+    def rewrite_blob(blob, bucket, new_name):
+        """Copies a blob to a new location with the rewrite API.
+        A single copy request may time out for large blobs or copies across locations.
+        The rewrite API copies the data in multiple calls, each call continues with the token of the previous call.
+
+        Args:
+            blob: The source Google Cloud Storage Blob object.
+            bucket: The destination bucket.
+            new_name: The name of the new blob in the destination bucket.
+
+        Returns: The new blob.
+
+        See Also: https://cloud.google.com/storage/docs/json_api/v1/objects/rewrite
+        """
+        new_blob = bucket.blob(new_name)
+        token, rewritten, total = api_call(new_blob.rewrite, blob)
+        while token is not None:
+            logger.debug("Rewriting %s: %s of %s bytes...", new_name, rewritten, total)
+            token, rewritten, total = api_call(new_blob.rewrite, blob, token=token)
+        return new_blob
 
     @staticmethod
     def delete_blob(blob):
-        blob.delete()
+        api_call(blob.delete)
+
+    @classmethod
+    def exists_many(cls, uris):
+        """Determines whether the blobs exist, by sending individual metadata requests concurrently.
+        The requests share the connection pool of the client, like parallel_blobs().
+
+        Args:
+            uris: A list of Google Cloud Storage URIs, e.g. ["gs://bucket_name/path/to/file"].
+
+        Returns: A dictionary mapping each URI to True if the blob exists, otherwise False.
+        """
+        objects = [GSObject(uri) for uri in uris]
+        with ThreadPoolExecutor(max_workers=cls.MAX_WORKERS) as executor:
+            results = executor.map(lambda obj: api_call(obj.bucket.blob(obj.prefix).exists), objects)
+            return {obj.uri: exists for obj, exists in zip(objects, results)}
+
+    def thread_client(self):
+        """Gets the client for sending batch requests in the current thread.
+        The client shares the project and credentials with the cached client.
+        """
+        client = getattr(self._thread_local, "client", None)
+        if client is None:
+            client = storage.Client(project=self.client.project, credentials=self.client._credentials)
+            self._thread_local.client = client
+        return client
 
 
 class GSPrefix(CloudStoragePrefix, GSObject):
-    # @api_decorator
-    def batch_request(self, blobs, method, *args, **kwargs):
-        """Sends a batch request to run method of a batch of blobs.
-        The "method" will be applied to each blob in blobs like method(blob, *args, **kwargs)
+    def batch_operation(self, method, *args, **kwargs):
+        """Applies the method to all blobs with the prefix.
+        Individual requests are sent concurrently, see parallel_blobs().
+        The method is retried by api_call() for each blob.
+
+        Returns: The number of blobs processed.
+
+        """
+        return self.parallel_blobs(self.blobs(fields=self.NAME_FIELDS), api_decorator(method), *args, **kwargs)
+
+    def parallel_blobs(self, blobs, method, *args, **kwargs):
+        """Applies the method to each blob by sending individual requests concurrently.
+        The requests share the connection pool of the client.
+        Individual requests are used instead of batch requests,
+        as the batch endpoint does not reuse connections and it is slower than concurrent requests.
+        The blobs are submitted in chunks while being iterated, so that a long listing will not be held in memory.
 
         Args:
-            blobs: A list of blobs, to be processed in a SINGLE batch.
-            method: The method for processing each blob.
+            blobs: An iterable of blobs.
+            method: The method for processing each blob, like method(blob, *args, **kwargs).
+                The method is responsible for retrying its own requests, e.g. with api_call(),
+                so that the retries are not nested.
             *args: Additional arguments for method.
             **kwargs: Keyword arguments for method.
 
-        Returns:
+        Returns: The number of blobs processed.
+            A blob is not counted if the method returns False, e.g. copy_blob() skipped the blob.
 
         """
-        if not blobs:
-            return 0
         counter = 0
-        try:
-            with self.client.batch():
-                for blob in blobs:
-                    method(blob, *args, **kwargs)
-                    counter += 1
-        except ValueError as ex:
-            # Suppress the no deferred request errors
-            # This error occurs when there is no file/blob in the batch.
-            if str(ex).strip() == "No deferred requests":
-                return 0
-            raise ex
+        blobs = iter(blobs)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            while True:
+                chunk = list(itertools.islice(blobs, 16 * self.MAX_WORKERS))
+                if not chunk:
+                    break
+                results = executor.map(lambda blob: method(blob, *args, **kwargs), chunk)
+                counter += sum(1 for r in results if r is not False)
         return counter
 
-    # @api_decorator
-    def batch_operation(self, method, *args, **kwargs):
-        blobs = self.blobs()
-        batch = []
-        counter = 0
-        for blob in blobs:
-            batch.append(blob)
-            if len(batch) > self.MAX_BATCH_SIZE:
-                counter += self.batch_request(batch, method, *args, **kwargs)
-                batch = []
-        if batch:
-            counter += self.batch_request(batch, method, *args, **kwargs)
-        return counter
+    def delete_parallel(self, blobs):
+        """Deletes blobs by sending individual requests concurrently.
+        Blobs not found are ignored, like bucket.delete_blobs() with on_error,
+        as they may be deleted by other requests, e.g. a request retried after the blob was deleted.
+        Bucket.delete_blobs() is not used as it sends the requests one by one.
 
-    @api_decorator
-    def blobs(self, delimiter=None):
+        Returns: The number of blobs deleted.
+
+        """
+        def delete_blob(blob):
+            try:
+                self.delete_blob(blob)
+            except NotFound:
+                logger.debug("Blob %s not found.", blob.name)
+                return False
+
+        return self.parallel_blobs(blobs, delete_blob)
+
+    def copy_parallel(self, blobs, to):
+        """Copies blobs by sending individual copy requests concurrently.
+
+        Returns: The number of blobs copied.
+
+        """
+        return self.parallel_blobs(blobs, self.copy_blob, to)
+
+    def blobs(self, delimiter=None, fields=None):
         """Gets the blobs in the bucket having the prefix.
 
         The returning list will contain object in the folder and all sub-folders
@@ -244,13 +589,16 @@ class GSPrefix(CloudStoragePrefix, GSObject):
             delimiter: Use this to emulate hierarchy.
             If delimiter is None, the returning list will contain objects in the folder and in all sub-directories.
             Set delimiter to "/" to eliminate files in sub-directories.
+            fields: Selector specifying which fields to include in the response, e.g. NAME_FIELDS.
+            All fields will be included if fields is None.
 
-        Returns: A list of GCS blobs.
+        Returns: An iterator of GCS blobs.
+            The blobs are listed page by page as the iterator is consumed.
 
         See Also: https://googleapis.github.io/google-cloud-python/latest/storage/blobs.html
 
         """
-        return list(self.bucket.list_blobs(prefix=self.prefix, delimiter=delimiter))
+        return self.bucket.list_blobs(prefix=self.prefix, delimiter=delimiter, fields=fields, retry=LIST_RETRY)
 
     @property
     def uri_list(self):
@@ -258,47 +606,110 @@ class GSPrefix(CloudStoragePrefix, GSObject):
         """
         return [
             "gs://%s/%s" % (self.bucket_name, b.name)
-            for b in self.blobs()
+            for b in self.blobs(fields=self.NAME_FIELDS)
             if not b.name.endswith("/")
         ]
 
+    @property
+    def size(self):
+        """The size in bytes of all objects with the same prefix.
+        The sizes are summed from the listing, without requesting the metadata of each blob.
+        """
+        # The name is required for constructing the blob objects.
+        blobs = self.blobs(fields="items(name,size),nextPageToken")
+        return sum(int(b.size or 0) for b in blobs)
+
     @property
     def files(self):
+        return self.storage_files(self.blobs("/"))
+
+    @property
+    def objects(self):
+        """All storage files with the prefix, including the files in sub-folders.
+        The files are created while the blobs are being listed,
+        instead of listing the URIs first and then getting the metadata of each blob.
+        """
+        return self.storage_files(self.blobs())
+
+    def iter_objects(self):
+        """Iterates through the storage files with the prefix, including the files in sub-folders.
+        The pages of the listing are requested as the iteration goes.
+        """
+        return self.iter_storage_files(self.blobs())
+
+    def storage_files(self, blobs):
+        """Creates StorageFile objects from the blobs in a single pass, skipping the "folder" blobs.
+        The listed blobs are attached to the files, so that the metadata will not be requested again.
+        """
+        return list(self.iter_storage_files(blobs))
+
+    def iter_storage_files(self, blobs):
+        """Yields a StorageFile for each blob, skipping the "folder" blobs.
+        """
         from .io import StorageFile
-        storage_files = []
-        for b in self.blobs("/"):
+        for b in blobs:
             if b.name.endswith("/"):
                 continue
             storage_file = StorageFile("gs://%s/%s" % (self.bucket_name, b.name))
             storage_file.raw_io._blob = b
-            storage_files.append(storage_file)
-        return storage_files
+            yield storage_file
 
     @property
     def folders(self):
         return self.list_folders()
 
-    @api_decorator
+    def list_prefixes(self):
+        """Gets the prefixes of the sub-folders, i.e. the blob names end with "/" after the prefix.
+        Only the prefixes are requested and the pages are consumed without iterating the items,
+        so that the blob objects will not be transferred or constructed.
+
+        Returns: A set of prefixes.
+        """
+        prefixes = set()
+        pages = self.bucket.list_blobs(
+            prefix=self.prefix, delimiter='/', fields=self.PREFIX_FIELDS, retry=LIST_RETRY
+        ).pages
+        for page in pages:
+            prefixes.update(page.prefixes)
+        return prefixes
+
     def list_folders(self):
         from .io import StorageFolder
-        iterator = self.bucket.list_blobs(prefix=self.prefix, delimiter='/')
-        list(iterator)
         return [
             StorageFolder("gs://%s/%s" % (self.bucket_name, p))
-            for p in iterator.prefixes
+            for p in self.list_prefixes()
         ]
 
+    @api_decorator
     def exists(self):
-        return True if self.blob.exists() or self.objects else False
+        """Determines if there is any blob with the prefix.
+        A single listing request answers both "blob exists at the prefix" and "prefix is not empty".
+        """
+        blobs = self.bucket.list_blobs(prefix=self.prefix, max_results=1, fields="items(name)")
+        return next(iter(blobs), None) is not None
 
     @api_decorator
+    def first_child(self):
+        """Gets the name of a blob under the prefix, other than the blob of the prefix itself, i.e. the "folder".
+        At most two blob names are listed in a single request.
+
+        Returns: A blob name, or None if there is no blob under the prefix.
+        """
+        blobs = self.bucket.list_blobs(prefix=self.prefix, max_results=2, fields="items(name)")
+        for b in blobs:
+            if b.name != self.prefix:
+                return b.name
+        return None
+
     def delete(self):
-        """Deletes all objects with the same prefix."""
-        counter = self.batch_operation(self.delete_blob)
-        logger.debug("%d files deleted." % counter)
+        """Deletes all objects with the same prefix.
+        Individual requests are sent concurrently.
+        """
+        counter = self.delete_parallel(self.blobs(fields=self.NAME_FIELDS))
+        self.invalidate_prefix(self.bucket_name, self.prefix)
+        logger.debug("%d files deleted.", counter)
         return counter
 
-    @api_decorator
     def copy(self, to, contents_only=False):
         """Copies folder/file in a Google Cloud storage directory to another one.
 
@@ -364,7 +775,7 @@ class GSPrefix(CloudStoragePrefix, GSObject):
         # Check if the destination is a bucket root.
         # Prefix will be empty if destination is bucket root.
         # Always append "/" to bucket root.
-        if not GSObject(to).prefix and not to.endswith("/"):
+        if not parse_gs_uri(to)[1] and not to.endswith("/"):
             to += "/"
 
         if self.prefix.endswith("/"):
@@ -385,12 +796,12 @@ class GSPrefix(CloudStoragePrefix, GSObject):
                 # simply replace the prefix.
                 pass
         # logger.debug("Copying files to %s" % to)
-        source_files = self.blobs()
-        if not source_files:
-            logger.debug("No files in %s" % self.uri)
+        # Initialize the destination once for all blobs.
+        counter = self.copy_parallel(self.blobs(fields=self.NAME_FIELDS), GSObject(to))
+        if not counter:
+            logger.debug("No files copied from %s", self.uri)
             return 0
-        counter = self.batch_operation(self.copy_blob, to)
-        logger.debug("%d files copied." % counter)
+        logger.debug("%d files copied.", counter)
         return counter
 
 
@@ -415,48 +826,81 @@ class GSFolder(GSPrefix, StorageFolderBase):
         if self.prefix and not self.prefix.endswith("/"):
             self.prefix += "/"
 
-    def exists(self):
-        return True if self.blob.exists() or self.file_paths or self.folder_paths else False
-
     @property
     def folder_paths(self):
         """Folders(Directories) in the directory.
         """
-        return self.__folders_paths()
-
-    @api_decorator
-    def __folders_paths(self):
-        iterator = self.bucket.list_blobs(prefix=self.prefix, delimiter='/')
-        list(iterator)
-        return [
-            "gs://%s/%s" % (self.bucket_name, p)
-            for p in iterator.prefixes
-        ]
+        return self.list_paths()[1]
 
     @property
     def file_paths(self):
         """Files in the directory
         """
-        paths = self.__file_paths()
-        return paths
+        return self.list_paths()[0]
 
-    def __file_paths(self):
-        return [
-            "gs://%s/%s" % (self.bucket_name, b.name)
-            for b in self.blobs("/")
-            if not b.name.endswith("/")
-        ]
+    def scan(self):
+        """Lists the files and the sub-folders in the directory with a single traversal.
+        The listed blobs are attached to the files, so that the metadata will not be requested again.
+
+        Returns: A 2-tuple of (files, folders), a list of StorageFiles and a list of StorageFolders.
+        """
+        from .io import StorageFolder
+        blobs = self.blobs("/")
+        files = self.storage_files(blobs)
+        # The prefixes are available after all pages are consumed.
+        folders = [StorageFolder("gs://%s/%s" % (self.bucket_name, p)) for p in sorted(blobs.prefixes)]
+        return files, folders
+
+    def list_paths(self):
+        """Lists the paths of the files and the sub-folders in the directory with a single traversal.
+        Only the names are requested.
+
+        Returns: A 2-tuple of (file_paths, folder_paths)
+        """
+        file_paths = []
+        prefixes = set()
+        for page in self.blobs("/", fields=self.NAME_FIELDS).pages:
+            file_paths.extend(
+                "gs://%s/%s" % (self.bucket_name, b.name)
+                for b in page if not b.name.endswith("/")
+            )
+            prefixes.update(page.prefixes)
+        folder_paths = ["gs://%s/%s" % (self.bucket_name, p) for p in prefixes]
+        return file_paths, folder_paths
 
-    @api_decorator
     def filter_files(self, prefix):
         return [
             GSFile("gs://%s/%s" % (self.bucket_name, b.name))
-            for b in self.bucket.list_blobs(prefix=os.path.join(self.prefix, prefix), delimiter='/')
+            for b in self.bucket.list_blobs(
+                prefix=os.path.join(self.prefix, prefix), delimiter='/', fields=self.NAME_FIELDS, retry=LIST_RETRY
+            )
             if not b.name.endswith("/")
         ]
 
 
 class GSFile(GSObject, CloudStorageIO):
+    # Files larger than this will be uploaded in parts concurrently and then composed into one blob.
+    PARALLEL_UPLOAD_THRESHOLD = 32 * 1024 * 1024
+    # The number of parts uploaded concurrently. Each part holds a buffer of RESUMABLE_CHUNK_SIZE in memory.
+    PARALLEL_UPLOAD_WORKERS = 8
+    # Composite blobs do not have MD5 hash.
+    # The MD5 of the data uploaded in parts is stored in the custom metadata with this key.
+    MD5_METADATA_KEY = "aries-md5"
+    # GCS allows at most 32 components in a single compose request.
+    MAX_COMPOSE_PARTS = 32
+    # The number of parts accepted by complete_multipart_upload().
+    # More than MAX_COMPOSE_PARTS parts are composed in rounds, see complete_multipart_upload().
+    MAX_UPLOAD_PARTS = 10000
+    # Files larger than this will be uploaded with resumable uploads in chunks of RESUMABLE_CHUNK_SIZE.
+    # The chunk size must be a multiple of 256 KB.
+    RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+    RESUMABLE_CHUNK_SIZE = 32 * 1024 * 1024
+    # Download the next chunks in the background when the file is read sequentially.
+    PREFETCH_DEPTH = 4
+    # Files larger than this will be downloaded in chunks concurrently.
+    PARALLEL_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024
+    PARALLEL_DOWNLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+
     def __init__(self, uri):
         """Represents a file on Google Cloud Storage as a file-like object implementing the IOBase interface.
 
@@ -473,21 +917,263 @@ class GSFile(GSObject, CloudStorageIO):
 
     @property
     def updated_time(self):
-        return self.blob.updated
+        return self.load_blob().updated
 
     @property
     def md5_hex(self):
-        return binascii.hexlify(base64.urlsafe_b64decode(self.blob.md5_hash)).decode()
+        blob = self.load_blob()
+        md5_hash = blob.md5_hash
+        # Composite objects do not have MD5 hash, use the one stored by upload_parallel() if available.
+        if not md5_hash:
+            return (blob.metadata or dict()).get(self.MD5_METADATA_KEY)
+        return binascii.hexlify(base64.urlsafe_b64decode(md5_hash)).decode()
 
     def get_size(self):
-        return self.blob.size
+        return self.load_blob().size
+
+    def exists(self):
+        """Determines if the blob exists.
+        The metadata is always requested, so that a blob deleted after it is cached will not be found.
+        """
+        return self.reload_blob().generation is not None
+
+    def move(self, to):
+        """Moves the file to a new location.
+        Within the same bucket, the blob is renamed without checking the existence of the new blob.
+        """
+        destination = GSObject(to)
+        if destination.bucket_name == self.bucket_name:
+            if destination.prefix != self.prefix:
+                api_call(self.bucket.rename_blob, self.blob, destination.prefix)
+        else:
+            self.rewrite_blob(self.blob, destination.bucket, destination.prefix)
+            api_call(self.blob.delete)
+        self.invalidate()
+        destination.invalidate()
+        return destination
 
     def read_bytes(self, start, end):
-        return api_call(self.blob.download_as_bytes, start=start, end=end)
+        # The downloaded data is copied once into bytes, so that read() returns bytes like other files.
+        return bytes(api_call(self.download_range, start, end))
+
+    def download_range(self, start, end):
+        """Downloads the bytes from position start to position end (inclusive) into a preallocated buffer.
+        The response is streamed into the buffer directly,
+        instead of being buffered and copied again as in download_as_bytes().
+
+        Returns: A memoryview of the buffer containing the downloaded bytes.
+        """
+        writer = BufferWriter(end - start + 1)
+        # The checksum of the whole blob cannot be validated for a range.
+        # raw_download keeps the positions consistent with the stored size, even if the blob is gzip-encoded.
+        self.blob.download_to_file(writer, start=start, end=end, checksum=None, raw_download=True)
+        return writer.getvalue()
 
     def download(self, to_file_obj):
-        api_call(self.blob.download_to_filename, to_file_obj.name)
+        """Downloads the blob into a file object.
+        download_to_file() is used instead of download_to_filename(),
+        which removes the file when the blob does not exist.
+
+        Raises: FileNotFoundError if the blob does not exist.
+        """
+        try:
+            file_path = str(getattr(to_file_obj, "name", ""))
+            size = self.load_blob().size
+            # Ranged requests are written to the file by path, so the file must be empty and on the disk.
+            if size and size > self.PARALLEL_DOWNLOAD_THRESHOLD and os.path.isfile(file_path) \
+                    and to_file_obj.tell() == 0:
+                self.download_parallel(to_file_obj)
+            else:
+                api_call(self.blob.download_to_file, to_file_obj)
+        except NotFound as ex:
+            raise FileNotFoundError("File %s not found." % self.uri) from ex
+        return to_file_obj
+
+    def download_parallel(self, to_file_obj):
+        """Downloads the blob in chunks with concurrent ranged requests, and writes the chunks to the file in place.
+        The position of to_file_obj will be at the end of the file after downloading.
+
+        See Also: https://cloud.google.com/python/docs/reference/storage/latest/google.cloud.storage.transfer_manager
+        """
+        logger.debug("Downloading %s in chunks...", self.uri)
+        to_file_obj.flush()
+        api_call(
+            transfer_manager.download_chunks_concurrently, self.blob, to_file_obj.name,
+            chunk_size=self.PARALLEL_DOWNLOAD_CHUNK_SIZE,
+            worker_type=transfer_manager.THREAD, max_workers=8
+        )
+        to_file_obj.seek(0, 2)
         return to_file_obj
 
     def upload(self, from_file_obj):
-        api_call(self.blob.upload_from_file, from_file_obj)
+        try:
+            start = from_file_obj.tell()
+            size = from_file_obj.seek(0, 2) - start
+            from_file_obj.seek(start)
+        except (AttributeError, OSError, ValueError):
+            start = None
+            size = None
+        file_path = str(getattr(from_file_obj, "name", ""))
+        if size and size > self.PARALLEL_UPLOAD_THRESHOLD and os.path.isfile(file_path):
+            return self.upload_parallel(file_path, start, size)
+        # Use a new blob instead of the cached one, which may be shared with other objects.
+        blob = self.bucket.blob(self.prefix)
+        if size is None or size > self.RESUMABLE_UPLOAD_THRESHOLD:
+            # Upload in chunks with a resumable upload, so that an error will only retry the current chunk.
+            blob.chunk_size = self.RESUMABLE_CHUNK_SIZE
+        if start:
+            # Resumable uploads require the stream to start at position 0.
+            from_file_obj = FileRange(from_file_obj, start, size)
+        # The upload is retried only by the client library, which rewinds or resumes the stream.
+        # It is not wrapped in api_call(), so that the retries are not nested.
+        blob.upload_from_file(from_file_obj, size=size, retry=DEFAULT_RETRY)
+        self.invalidate()
+
+    def upload_append(self, from_file_obj):
+        """Appends the data in a local file to the existing blob, without downloading the blob.
+        The data is uploaded as a temporary blob and then composed with the existing blob.
+
+        See Also: https://cloud.google.com/storage/docs/composing-objects#create-composite-client-libraries
+        """
+        # Use a unique name so that concurrent appends do not overwrite each other's temporary blob.
+        temp_blob = self.temp_blob(self.create_multipart_upload(), "append")
+        start = from_file_obj.tell()
+        size = from_file_obj.seek(0, 2) - start
+        try:
+            # The upload is retried by the client library, see upload().
+            temp_blob.upload_from_file(FileRange(from_file_obj, start, size), size=size, retry=DEFAULT_RETRY)
+            api_call(self.bucket.blob(self.prefix).compose, [self.blob, temp_blob])
+        finally:
+            try:
+                api_call(temp_blob.delete)
+            except NotFound:
+                pass
+        self.invalidate()
+
+    def upload_parallel(self, file_path, start, size):
+        """Uploads a local file in parts concurrently and composes the parts into one blob.
+        At most PARALLEL_UPLOAD_WORKERS parts are uploaded at the same time,
+        each holding a buffer of RESUMABLE_CHUNK_SIZE.
+        The MD5 of the data is stored in the metadata of the composite blob, see md5_hex.
+
+        Args:
+            file_path: The path of the local file.
+            start: The position in the file to start uploading.
+            size: The number of bytes to be uploaded.
+
+        See Also: https://cloud.google.com/storage/docs/parallel-composite-uploads
+
+        """
+        part_count = min(self.MAX_COMPOSE_PARTS, math.ceil(size / self.PARALLEL_UPLOAD_THRESHOLD))
+        part_size = math.ceil(size / part_count)
+        upload_id = self.create_multipart_upload()
+        parts = [self.temp_blob(upload_id, "part%d" % i) for i in range(part_count)]
+
+        def upload_part(i):
+            offset = i * part_size
+            length = min(part_size, size - offset)
+            with open(file_path, 'rb') as f:
+                # The upload is retried by the client library, see upload().
+                parts[i].upload_from_file(FileRange(f, start + offset, length), size=length, retry=DEFAULT_RETRY)
+
+        def md5_hex():
+            hash_md5 = hashlib.md5()
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                remaining = size
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    hash_md5.update(chunk)
+                    remaining -= len(chunk)
+            return hash_md5.hexdigest()
+
+        logger.debug("Uploading %s in %s parts...", self.uri, part_count)
+        try:
+            with ThreadPoolExecutor(max_workers=min(part_count, self.PARALLEL_UPLOAD_WORKERS)) as executor:
+                results = executor.map(upload_part, range(part_count))
+                # The MD5 is computed in this thread while the parts are being uploaded.
+                metadata = {self.MD5_METADATA_KEY: md5_hex()}
+                list(results)
+        except Exception:
+            self.abort_multipart_upload(upload_id, parts)
+            raise
+        self.complete_multipart_upload(upload_id, parts, metadata)
+
+    def create_multipart_upload(self):
+        """Starts uploading this file in parts with upload_part().
+
+        GCS does not have multipart uploads like S3.
+        The parts are uploaded as temporary blobs and composed by complete_multipart_upload().
+
+        Returns: A unique ID used in the names of the temporary blobs, see temp_blob().
+
+        """
+        return uuid.uuid4().hex
+
+    def temp_blob(self, upload_id, name):
+        """Gets a temporary blob of a multipart upload.
+        The temporary blobs are named under a unique prefix next to this file,
+        so that they do not overwrite any existing blob.
+        """
+        return self.bucket.blob(
+            "%s.aries-upload-%s/%s" % (self.prefix, upload_id, name), chunk_size=self.RESUMABLE_CHUNK_SIZE
+        )
+
+    def upload_part(self, upload_id, part_number, data):
+        """Uploads the bytes of one part as a temporary blob.
+
+        Returns: The blob of the part, to be passed to complete_multipart_upload().
+
+        """
+        part = self.temp_blob(upload_id, "part%d" % part_number)
+        # The upload is retried by the client library, see upload().
+        part.upload_from_file(BytesIO(data), size=len(data), retry=DEFAULT_RETRY)
+        return part
+
+    def complete_multipart_upload(self, upload_id, parts, metadata=None):
+        """Composes the parts, ordered by part number, into this file and deletes the parts.
+        GCS composes at most MAX_COMPOSE_PARTS blobs in a request.
+        More parts are composed in groups into temporary blobs, which are then composed again.
+
+        Args:
+            upload_id: The ID returned by create_multipart_upload().
+            parts: The blobs returned by upload_part().
+            metadata: Custom metadata of the composed blob.
+
+        """
+        temp_blobs = list(parts)
+        try:
+            level = 0
+            while len(parts) > self.MAX_COMPOSE_PARTS:
+                groups = [parts[i:i + self.MAX_COMPOSE_PARTS] for i in range(0, len(parts), self.MAX_COMPOSE_PARTS)]
+                composed = [self.temp_blob(upload_id, "compose%d-%d" % (level, j)) for j in range(len(groups))]
+                temp_blobs.extend(composed)
+                with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENCY) as executor:
+                    list(executor.map(lambda blob, group: api_call(blob.compose, group), composed, groups))
+                parts = composed
+                level += 1
+            destination = self.bucket.blob(self.prefix)
+            if metadata:
+                destination.metadata = metadata
+            api_call(destination.compose, parts)
+        finally:
+            self.abort_multipart_upload(upload_id, temp_blobs)
+        self.invalidate()
+
+    def abort_multipart_upload(self, upload_id, parts):
+        """Deletes the parts uploaded by upload_part().
+        """
+        # Delete the parts in a batch using the client of this thread,
+        # so that requests from other threads will not be added to the batch.
+        client = self.thread_client()
+        bucket = client.bucket(self.bucket_name)
+        for i in range(0, len(parts), self.MAX_BATCH_SIZE):
+            try:
+                with client.batch():
+                    for part in parts[i:i + self.MAX_BATCH_SIZE]:
+                        bucket.blob(part.name).delete()
+            except NotFound:
+                # Some parts may not be uploaded if there is an error.
+                pass
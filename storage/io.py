@@ -2,27 +2,62 @@
 """
 import os
 import json
+import math
 import logging
-import binascii
 import inspect
+import importlib
 import traceback
-from google.cloud import storage
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import SEEK_SET, UnsupportedOperation
 from io import BufferedIOBase, BufferedRandom, BufferedReader, BufferedWriter, TextIOWrapper, BytesIO
 from .base import StorageObject, StorageFolderBase
-from .cloud import CloudStorageIO
-from . import gs, file, web, s3
+from .cloud import CloudStorageIO, CloudStoragePrefix
+from . import file
 logger = logging.getLogger(__name__)
+# The first 2 bytes of a gzip file.
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def get_raw_class(registry, scheme):
+    """Gets the raw class for a scheme from a registry.
+
+    A registry value can be a class, or the name of a class in a module of this package, e.g. "gs.GSFile".
+    The module is imported when the scheme is used for the first time,
+    so that the cloud storage SDKs are not imported for local files.
+
+    Returns: The raw class, or None if the scheme is not in the registry.
+
+    """
+    raw_class = registry.get(scheme)
+    if isinstance(raw_class, str):
+        module_name, class_name = raw_class.rsplit(".", 1)
+        raw_class = getattr(importlib.import_module("." + module_name, __package__), class_name)
+        registry[scheme] = raw_class
+    return raw_class
+
+
+@lru_cache(maxsize=64)
+def parse_mode(mode):
+    """Parses the mode of opening a file into a 7-tuple of flags:
+    (creating, reading, writing, appending, updating, text, binary).
+    The results are cached, since files are usually opened in a few modes.
+    """
+    modes = set(mode)
+    if modes - set("axrwb+t") or len(mode) > len(modes):
+        raise ValueError("invalid mode: %r" % mode)
+    return tuple(c in modes for c in "xrwa+tb")
 
 
 class StoragePrefix(StorageObject):
     """Represents a collections of object with the same URI prefix
     """
     # Maps the scheme to the underlying raw class.
+    # Classes given by name are imported on first use, see get_raw_class().
     registry = {
         "file": file.LocalPrefix,
-        "gs": gs.GSPrefix,
-        "s3": s3.S3Prefix
+        "gs": "gs.GSPrefix",
+        "s3": "s3.S3Prefix"
     }
 
     def __init__(self, uri):
@@ -32,7 +67,7 @@ class StoragePrefix(StorageObject):
             uri: URI prefix.
         """
         super(StoragePrefix, self).__init__(uri)
-        raw_class = self.registry.get(self.scheme)
+        raw_class = get_raw_class(self.registry, self.scheme)
         if not raw_class:
             raise NotImplementedError("No implementation available for scheme: %s" % self.scheme)
         self.raw = raw_class(uri)
@@ -43,29 +78,42 @@ class StoragePrefix(StorageObject):
         """
         return self.raw.objects
 
+    def iter_objects(self):
+        """Iterates through the StorageFile objects with the same prefix, including files in sub-folders.
+        """
+        return self.raw.iter_objects()
+
     @property
     def files(self):
         """StorageFile objects having the same prefix but not under any sub-folder after the prefix
         """
-        if hasattr(self.raw, "files"):
+        # Check the class, hasattr() on the instance would evaluate the property and list the objects.
+        if hasattr(type(self.raw), "files"):
             return self.raw.files
         # Use objects to determine files if the files property is not supported by the raw class
-        return [f for f in self.objects if "/" not in f.path.replace(self.prefix, "")]
+        return [f for f in self.iter_objects() if "/" not in self.relative_path(f)]
 
     @property
     def folders(self):
         """StorageFolder objects having the same prefix but not under any sub-folder after the prefix
         """
-        if hasattr(self.raw, "folders"):
+        # Check the class, hasattr() on the instance would evaluate the property and list the objects.
+        if hasattr(type(self.raw), "folders"):
             return self.raw.folders
         folder_paths = set()
-        for f in self.objects:
-            relative_path = f.path.replace(self.prefix, "")
-            if "/" in relative_path:
-                dir_name = relative_path.split("/", 1)[0]
-                folder_paths.add(self.prefix + dir_name)
+        for f in self.iter_objects():
+            dir_name, sep, _ = self.relative_path(f).partition("/")
+            if sep:
+                folder_paths.add(self.uri + dir_name)
         return [StorageFolder(p) for p in folder_paths]
 
+    def relative_path(self, storage_object):
+        """Gets the path of a storage object relative to this prefix.
+        """
+        if storage_object.path.startswith(self.path):
+            return storage_object.path[len(self.path):]
+        return storage_object.path
+
     @property
     def size(self):
         return self.raw.size
@@ -98,7 +146,7 @@ class StoragePrefix(StorageObject):
                 pass
 
         for storage_file in self.objects:
-            storage_file.copy(storage_file.uri.replace(self.uri, to))
+            storage_file.copy(to + storage_file.uri[len(self.uri):])
 
 
 class StorageFolder(StorageFolderBase):
@@ -108,19 +156,26 @@ class StorageFolder(StorageFolderBase):
 
     """
     # Maps the scheme to the underlying raw class.
+    # Classes given by name are imported on first use, see get_raw_class().
     registry = {
         "file": file.LocalFolder,
-        "gs": gs.GSFolder,
-        "s3": s3.S3Folder
+        "gs": "gs.GSFolder",
+        "s3": "s3.S3Folder"
     }
+    # The number of files to be copied or downloaded concurrently.
+    MAX_TRANSFER_WORKERS = int(os.environ.get("ARIES_TRANSFER_CONCURRENCY", 16))
 
-    def __init__(self, uri):
+    def __init__(self, uri, cache_listing=False):
         """Initializes a StorageFolder.
 
         Args:
             uri: URI of the folder.
                 The "file://" scheme will be used for local paths.
                 A tailing slash "/" will be added to the path automatically.
+            cache_listing: Cache the listings of the files and folders until refresh() is called,
+                so that they are not requested repeatedly from the cloud storage.
+                Changes made after the folder is listed will not be seen, use this only when the folder is not changing.
+                Defaults to False, i.e. the folder is listed every time the files or folders are accessed.
 
         Examples:
             StorageFolder("gs://bucket_name/path/to/folder")
@@ -132,10 +187,16 @@ class StorageFolder(StorageFolderBase):
 
         """
         super(StorageFolder, self).__init__(uri)
-        raw_class = self.registry.get(self.scheme)
+        raw_class = get_raw_class(self.registry, self.scheme)
         if not raw_class:
             raise NotImplementedError("No implementation available for scheme: %s" % self.scheme)
         self.raw = raw_class(uri)
+        self.cache_listing = cache_listing
+        # Listings of the files and folders, cached only when cache_listing is True.
+        self.__files = None
+        self.__folders = None
+        self.__files_by_name = None
+        self.__folders_by_name = None
 
     @staticmethod
     def init(uri):
@@ -154,11 +215,15 @@ class StorageFolder(StorageFolderBase):
         Returns: A list of StorageFiles in the folder.
 
         """
+        if self.__files is not None:
+            return list(self.__files)
         try:
-            return self.raw.files
+            files = self.raw.files
         except AttributeError:
-            pass
-        return [StorageFile(f) for f in self.file_paths]
+            files = [StorageFile(f) for f in self.file_paths]
+        if self.cache_listing:
+            self.__files = files
+        return list(files)
 
     @property
     def folders(self):
@@ -167,7 +232,42 @@ class StorageFolder(StorageFolderBase):
         Returns: A list of StorageFolders in the folder.
 
         """
-        return [StorageFolder(f) for f in self.folder_paths]
+        if self.__folders is not None:
+            return list(self.__folders)
+        folders = [StorageFolder(f) for f in self.folder_paths]
+        if self.cache_listing:
+            self.__folders = folders
+        return list(folders)
+
+    def scan(self):
+        """Lists the files and the sub-folders in the folder.
+        Both of them are listed together if the raw class implements scan(),
+        e.g. a single delimited listing for cloud storage.
+
+        Returns: A 2-tuple of (files, folders), a list of StorageFiles and a list of StorageFolders.
+
+        """
+        if self.__files is not None and self.__folders is not None:
+            return list(self.__files), list(self.__folders)
+        if not hasattr(self.raw, "scan"):
+            return self.files, self.folders
+        files, folders = self.raw.scan()
+        if self.cache_listing:
+            self.__files = files
+            self.__folders = folders
+            self.__files_by_name = None
+            self.__folders_by_name = None
+        return list(files), list(folders)
+
+    def refresh(self):
+        """Clears the cached listings of the files and folders.
+        The files and folders will be listed again when they are accessed.
+        """
+        self.__files = None
+        self.__folders = None
+        self.__files_by_name = None
+        self.__folders_by_name = None
+        return self
 
     @property
     def objects(self):
@@ -177,11 +277,21 @@ class StorageFolder(StorageFolderBase):
             return self.raw.objects
         except (AttributeError, UnsupportedOperation):
             pass
+        return list(self.iter_objects())
 
-        object_list = self.files
-        for folder in self.folders:
-            object_list.extend(folder.objects)
-        return object_list
+    def iter_objects(self):
+        """Iterates through the storage file objects in this folder and sub-folders.
+        The sub-folders are listed as the iteration goes.
+        """
+        if hasattr(self.raw, "iter_objects"):
+            yield from self.raw.iter_objects()
+            return
+        # Walk the sub-folders with a stack instead of recursion, in the same order.
+        stack = [self]
+        while stack:
+            files, folders = stack.pop().scan()
+            yield from files
+            stack.extend(reversed(folders))
 
     @property
     def size(self):
@@ -189,22 +299,17 @@ class StorageFolder(StorageFolderBase):
             return self.raw.size
         except (AttributeError, UnsupportedOperation):
             pass
-        total = 0
-        for f in self.files:
-            s = f.size
-            total += s if s else 0
-        for folder in self.folders:
-            s = folder.size
-            total += s if s else 0
-        return total
+        # Get the size of each file concurrently, as it may require a request for the metadata.
+        with ThreadPoolExecutor(max_workers=self.MAX_TRANSFER_WORKERS) as executor:
+            return sum(s for s in executor.map(lambda f: f.size, self.iter_objects()) if s)
 
     @property
     def file_names(self):
-        return [os.path.basename(f) for f in self.file_paths]
+        return [f.basename for f in self.files]
 
     @property
     def folder_names(self):
-        return [str(f).rstrip("/").rsplit("/", 1)[-1] for f in self.folder_paths]
+        return [f.basename for f in self.folders]
 
     @property
     def file_paths(self):
@@ -224,9 +329,9 @@ class StorageFolder(StorageFolderBase):
         There will be no error if the folder already exists.
         """
         self.raw.create()
-        return self
+        return self.refresh()
 
-    def copy(self, to, contents_only=False):
+    def copy(self, to, contents_only=False, max_workers=None):
         """Copies the folder.
 
         Args:
@@ -234,6 +339,8 @@ class StorageFolder(StorageFolderBase):
             contents_only: Copies only the content of the folder.
                 Defaults to False, i.e. a folder (with the same name as this folder)
                 will be created at the destination to contain the files.
+            max_workers: The number of files to be copied concurrently.
+                Defaults to MAX_TRANSFER_WORKERS.
 
         Returns:
 
@@ -248,23 +355,60 @@ class StorageFolder(StorageFolderBase):
 
         if not contents_only:
             to = os.path.join(to, self.name)
-        # logger.debug(self.file_paths)
-        for storage_file in self.files:
-            storage_file.copy(os.path.join(to, storage_file.basename))
-        # logger.debug(self.folder_paths)
-        # Recursively copy the sub-folders.
-        for storage_folder in self.folders:
-            storage_folder.copy(os.path.join(to, storage_folder.basename))
-
-    def download(self, local_path):
-        if not os.path.exists(local_path):
-            os.makedirs(local_path)
-        # Download the files using copy()
-        for storage_file in self.files:
-            storage_file.copy(os.path.join(local_path, storage_file.basename))
-        # Recursively download the sub-folders.
-        for storage_folder in self.folders:
-            storage_folder.download(os.path.join(local_path, storage_folder.basename))
+        self.transfer(self.transfer_tasks(to), max_workers)
+
+    def download(self, local_path, max_workers=None):
+        """Downloads the folder and the sub-folders into a local directory.
+
+        Args:
+            local_path: The local directory, which will be created if it does not exist.
+            max_workers: The number of files to be downloaded concurrently.
+                Defaults to MAX_TRANSFER_WORKERS.
+
+        """
+        self.transfer(self.transfer_tasks(local_path, make_dirs=True), max_workers)
+
+    def transfer_tasks(self, to, make_dirs=False):
+        """Lists the files in the folder and sub-folders, with the destination of each file.
+
+        Args:
+            to: The destination of this folder.
+            make_dirs: Create the local directories for the destination, including the empty ones.
+
+        Returns: A list of 2-tuples, each contains a StorageFile and the destination URI.
+
+        """
+        def list_folder(folder):
+            # Transfer the files currently in the folder instead of the cached listing.
+            return folder.refresh().scan()
+
+        tasks = []
+        # The folders at the same depth are listed concurrently, level by level.
+        level = [(self, to)]
+        with ThreadPoolExecutor(max_workers=self.MAX_TRANSFER_WORKERS) as executor:
+            while level:
+                if make_dirs:
+                    for _, folder_dest in level:
+                        os.makedirs(folder_dest, exist_ok=True)
+                next_level = []
+                listings = executor.map(list_folder, [folder for folder, _ in level])
+                for (folder, folder_dest), (files, folders) in zip(level, listings):
+                    tasks.extend((storage_file, os.path.join(folder_dest, storage_file.basename)) for storage_file in files)
+                    next_level.extend((sub_folder, os.path.join(folder_dest, sub_folder.basename)) for sub_folder in folders)
+                level = next_level
+        return tasks
+
+    def transfer(self, tasks, max_workers=None):
+        """Copies the files concurrently.
+
+        Args:
+            tasks: A list of 2-tuples, each contains a StorageFile and the destination URI.
+            max_workers: The number of files to be copied concurrently.
+                Defaults to MAX_TRANSFER_WORKERS.
+
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or self.MAX_TRANSFER_WORKERS) as executor:
+            list(executor.map(lambda task: task[0].copy(task[1]), tasks))
 
     def upload_from(self, local_path):
         raise NotImplementedError()
@@ -283,7 +427,10 @@ class StorageFolder(StorageFolderBase):
             raise FileNotFoundError("Failed to copy files to %s" % to)
 
     def delete(self):
-        return self.raw.delete()
+        try:
+            return self.raw.delete()
+        finally:
+            self.refresh()
 
     def get_file_attributes(self, attribute=None):
         """Gets a list of files (represented by uri or other attribute) in the folder.
@@ -321,28 +468,47 @@ class StorageFolder(StorageFolderBase):
             LocalFolder: A LocalFolder instance of the sub folder.
                 None if the sub folder does not exist.
         """
-        for folder in self.folders:
-            if folder.basename == folder_name:
-                return folder
-        return None
+        if self.__folders is None and isinstance(self.raw, CloudStoragePrefix) and "/" not in folder_name:
+            # Check the folder directly with a single request, instead of listing the folder.
+            storage_folder = StorageFolder(self.uri + folder_name)
+            return storage_folder if storage_folder.exists() else None
+        folders_by_name = self.__folders_by_name
+        if folders_by_name is None:
+            folders_by_name = {folder.basename: folder for folder in self.folders}
+            if self.cache_listing:
+                self.__folders_by_name = folders_by_name
+        return folders_by_name.get(folder_name)
 
     def get_file(self, filename):
-        for f in self.files:
-            if f.basename == filename:
-                return f
-        return None
+        if self.__files is None and isinstance(self.raw, CloudStoragePrefix) and "/" not in filename:
+            # Check the file directly with a single request, instead of listing the folder.
+            storage_file = StorageFile(self.uri + filename)
+            return storage_file if storage_file.exists() else None
+        files_by_name = self.__files_by_name
+        if files_by_name is None:
+            files_by_name = {f.basename: f for f in self.files}
+            if self.cache_listing:
+                self.__files_by_name = files_by_name
+        return files_by_name.get(filename)
 
     def is_empty(self):
-        if self.files or self.folders:
+        if (self.__files is None or self.__folders is None) and hasattr(self.raw, "first_child"):
+            # Look for a single child, instead of listing the folder.
+            return self.raw.first_child() is None
+        files, folders = self.scan()
+        if files or folders:
             return False
         else:
             return True
 
     def empty(self):
-        for f in self.files:
-            f.delete()
-        for f in self.folders:
+        # Delete the files currently in the folder instead of the cached listing.
+        files, folders = self.refresh().scan()
+        # Cloud storage files are deleted concurrently, see FileBatch.
+        StorageFile.delete_many(files)
+        for f in folders:
             f.delete()
+        self.refresh()
 
     # Sub-class of StorageFolderBase can optionally implement the following methods
     #
@@ -410,6 +576,23 @@ class BufferedIOWrapper:
         self._check_closed()
         return self.buffered_io.read1(size)
 
+    def readline(self, size=-1):
+        self._check_closed()
+        return self.buffered_io.readline(size)
+
+    def readlines(self, hint=-1):
+        self._check_closed()
+        return self.buffered_io.readlines(hint)
+
+    def __iter__(self):
+        # Iterate the lines of the buffered_io directly.
+        self._check_closed()
+        return iter(self.buffered_io)
+
+    def __next__(self):
+        self._check_closed()
+        return next(self.buffered_io)
+
     def readable(self):
         self._check_closed()
         return self.buffered_io.readable()
@@ -465,6 +648,25 @@ class BufferedIOWrapper:
         self._check_closed()
         return self.buffered_io.isatty()
 
+    # Methods called in IO loops, which will be bound directly to the buffered_io once it is opened.
+    DIRECT_IO_METHODS = ("read1", "readinto", "readinto1", "readline", "write", "flush", "seek", "tell")
+
+    def _bind_io(self):
+        """Binds the DIRECT_IO_METHODS of the buffered_io to this object,
+        so that the calls skip the delegation and the closed check of this wrapper.
+        A closed buffered_io raises the ValueError by itself.
+        """
+        for name in self.DIRECT_IO_METHODS:
+            method = getattr(self.buffered_io, name, None)
+            if method is not None:
+                self.__dict__[name] = method
+
+    def _unbind_io(self):
+        """Removes the methods bound by _bind_io(), so that the methods of this wrapper will be used again.
+        """
+        for name in self.DIRECT_IO_METHODS:
+            self.__dict__.pop(name, None)
+
 
 class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
     """Represents a storage file.
@@ -503,15 +705,29 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         See https://www.python.org/download/releases/2.3/mro/
 
     """
-
+    # Maps the scheme to the underlying raw class.
+    # Classes given by name are imported on first use, see get_raw_class().
     registry = {
         "file": file.LocalFile,
-        "gs": gs.GSFile,
-        "s3": s3.S3File,
-        "http": web.WebFile,
-        "https": web.WebFile,
-        "ftp": web.WebFile
+        "gs": "gs.GSFile",
+        "s3": "s3.S3File",
+        "http": "web.WebFile",
+        "https": "web.WebFile",
+        "ftp": "web.WebFile"
     }
+    # Files larger than this will be copied to another scheme in parts concurrently,
+    # if the destination supports multipart uploads.
+    MULTIPART_COPY_THRESHOLD = 64 * 1024 * 1024
+    MULTIPART_COPY_CHUNK_SIZE = 64 * 1024 * 1024
+    # Limits the total size of the parts held in memory at the same time.
+    # Files needing parts larger than this are copied as a stream.
+    MULTIPART_COPY_MEMORY = 512 * 1024 * 1024
+    # The minimum buffer size for local files, which use the block size of the file system otherwise.
+    MIN_LOCAL_BUFFER_SIZE = 128 * 1024
+    # Reads of cloud files larger than this will be split into ranged requests sent concurrently.
+    PARALLEL_READ_THRESHOLD = 8 * 1024 * 1024
+    PARALLEL_READ_CHUNK_SIZE = 4 * 1024 * 1024
+    PARALLEL_READ_WORKERS = 16
 
     def __init__(self, uri):
         """Initialize a StorageFile object.
@@ -545,15 +761,12 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         """Initializes the underlying raw IO
         """
         # Create the underlying raw IO base on the scheme
-        raw_class = self.registry.get(self.scheme)
+        raw_class = get_raw_class(self.registry, self.scheme)
         if not raw_class:
             raise NotImplementedError("No implementation available for scheme: %s" % self.scheme)
         return raw_class(self.uri)
 
     def __open_raw_io(self, closefd=True, opener=None):
-        if not self.raw_io:
-            self.__init_raw_io()
-
         # Raw IO always operates in binary mode, t and b will be ignored.
         mode = [c for c in self.mode if c in "rw+ax"]
         if self.scheme == "file":
@@ -567,15 +780,15 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
 
         buffering = self.BUFFER_SIZE
         # For local file only
-        from .file import LocalFile
-        if isinstance(self.raw_io, LocalFile):
+        if isinstance(self.raw_io, file.LocalFile):
             try:
                 bs = os.fstat(self.raw_io.fileno()).st_blksize
             except (OSError, AttributeError):
                 pass
             else:
                 if bs > 1:
-                    buffering = bs
+                    # st_blksize is usually 4 KiB, which is too small to amortize the system calls.
+                    buffering = max(bs, self.MIN_LOCAL_BUFFER_SIZE)
         if buffering < 0:
             raise ValueError("Invalid buffering size: %s" % buffering)
         return buffering
@@ -623,17 +836,7 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         """Initializes the underlying raw IO and buffered IO
         """
         # The following code is modified based on python io.open()
-        modes = set(self.mode)
-        if modes - set("axrwb+t") or len(self.mode) > len(modes):
-            raise ValueError("invalid mode: %r" % self.mode)
-
-        creating = "x" in modes
-        reading = "r" in modes
-        writing = "w" in modes
-        appending = "a" in modes
-        updating = "+" in modes
-        text = "t" in modes
-        binary = "b" in modes
+        creating, reading, writing, appending, updating, text, binary = parse_mode(self.mode)
 
         self.__validate_args(text, binary, creating, reading, writing, appending, encoding, errors, newline, buffering)
         self.raw_io = self.__open_raw_io(closefd, opener)
@@ -698,6 +901,7 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
 
         # The buffered_io is the main IO stream used in the methods and properties.
         self.buffered_io = self.__init_io(buffering, encoding, errors, newline, closefd, opener)
+        self._bind_io()
         return self
 
     @staticmethod
@@ -722,7 +926,12 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
     def load_json(uri, **kwargs):
         """Loads a json file into a dictionary.
         """
-        return json.loads(StorageFile.init(uri, **kwargs).read())
+        if not kwargs:
+            # Read the file as bytes, so that large cloud files are downloaded with concurrent ranged requests.
+            # json.loads() detects the UTF-8, UTF-16 or UTF-32 encoding of the bytes.
+            return json.loads(StorageFile(uri).read())
+        with StorageFile.init(uri, **kwargs) as f:
+            return json.load(f)
 
     @property
     def closed(self):
@@ -745,8 +954,8 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         """Size of the file in bytes.
         None will be returned if the size cannot be determined.
         """
-        # hasattr will actually trigger the evaluation of the "size" property
-        if hasattr(self.raw_io, "size"):
+        # Check the class, hasattr() on the instance would evaluate the "size" property
+        if hasattr(type(self.raw_io), "size"):
             try:
                 return self.raw_io.size
             except Exception as ex:
@@ -770,6 +979,8 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         Raises: AttributeError if blob is not supported.
 
         """
+        if hasattr(self.raw_io, "load_blob"):
+            return self.raw_io.load_blob()
         if hasattr(self.raw_io, "blob"):
             return self.raw_io.blob
         raise AttributeError("%s:// does not support blob attribute" % self.scheme)
@@ -817,21 +1028,188 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
             self.buffered_io.close()
         self.raw_io.delete()
 
+    @staticmethod
+    def delete_many(uris):
+        """Deletes multiple files. Files not found are ignored.
+        Cloud storage files are grouped by the scheme and deleted concurrently, see FileBatch.
+        Other files are deleted one by one.
+
+        Args:
+            uris: An iterable of URIs or StorageFile objects.
+
+        """
+        batches = dict()
+        for uri in uris:
+            storage_file = uri if isinstance(uri, StorageFile) else StorageFile(uri)
+            if storage_file.scheme in ("gs", "s3"):
+                batches.setdefault(storage_file.scheme, FileBatch()).append(storage_file)
+            else:
+                storage_file.delete()
+        for batch in batches.values():
+            batch.delete()
+
     def copy(self, to):
 
         dest_file = StorageFile(to)
         # Use raw_io copy for same scheme, if possible
         if self.scheme == dest_file.scheme and hasattr(self.raw_io, "copy"):
             return self.raw_io.copy(to)
+        # Transfer between local and cloud storage with the local file directly,
+        # instead of streaming the data through the buffered IO of both files.
+        if self.scheme == "file" and isinstance(dest_file.raw_io, CloudStorageIO):
+            logger.debug("Uploading %s to %s" % (self.path, to))
+            with open(self.path, "rb") as f:
+                dest_file.raw_io.upload(f)
+            return os.path.getsize(self.path)
+        if dest_file.scheme == "file" and isinstance(self.raw_io, CloudStorageIO):
+            logger.debug("Downloading %s to %s" % (self.uri, dest_file.path))
+            # Check the source before the destination file is created. The size is None if the file is missing.
+            if self.raw_io.size is None:
+                raise FileNotFoundError("File %s not found." % self.uri)
+            dest_dir = os.path.dirname(dest_file.path)
+            if dest_dir:
+                os.makedirs(dest_dir, exist_ok=True)
+            with open(dest_file.path, "wb") as f:
+                self.raw_io.download(f)
+                return f.tell()
+        if hasattr(dest_file.raw_io, "upload_part"):
+            size = self.size
+            # The parts are held in memory, so each part must fit in MULTIPART_COPY_MEMORY.
+            if size is not None and size > self.MULTIPART_COPY_THRESHOLD \
+                    and math.ceil(size / dest_file.raw_io.MAX_UPLOAD_PARTS) <= self.MULTIPART_COPY_MEMORY:
+                return self.copy_multipart(dest_file, size)
         logger.debug("Copying file stream to %s" % to)
         with self.open("rb") as f:
             with dest_file.open('wb') as f_to:
                 return self.copy_stream(f, f_to)
 
+    def read_range(self, start, end):
+        """Reads bytes from position start to position end, inclusive, without opening this file.
+        This method can be called from multiple threads.
+        """
+        if isinstance(self.raw_io, CloudStorageIO):
+            return self.raw_io.read_bytes(start, end)
+        with StorageFile(self.uri).open("rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def parallel_read(self, start, size=None):
+        """Reads bytes from position start with concurrent ranged requests, without opening this file.
+        The chunks are written into a preallocated buffer as they arrive.
+
+        Args:
+            start: The position to start reading.
+            size: The maximum number of bytes to be returned. Read until the end of the file if it is None.
+
+        Returns: Bytes content from the file.
+            The buffer is copied once into the returned bytes, so the peak memory is twice the size of the read.
+            This keeps the return type the same as read() of other files.
+
+        """
+        end = self.raw_io.size
+        if end is None:
+            raise FileNotFoundError("File %s not found." % self.uri)
+        if size is not None and size >= 0:
+            end = min(end, start + size)
+        if end <= start:
+            return b""
+        buffer = bytearray(end - start)
+        view = memoryview(buffer)
+        chunk_size = self.PARALLEL_READ_CHUNK_SIZE
+
+        def read_chunk(offset):
+            chunk_end = min(offset + chunk_size, end)
+            view[offset - start:chunk_end - start] = self.read_range(offset, chunk_end - 1)
+
+        with ThreadPoolExecutor(max_workers=self.PARALLEL_READ_WORKERS) as executor:
+            # Consume the results so that the exceptions are raised.
+            list(executor.map(read_chunk, range(start, end, chunk_size)))
+        view.release()
+        return bytes(buffer)
+
+    def __parallel_read_start(self, size):
+        """Determines whether read(size) should be done by parallel_read().
+
+        Returns: The position to start reading, or None if the bytes should be read sequentially.
+        """
+        if not isinstance(self.raw_io, CloudStorageIO):
+            return None
+        if self.closed:
+            start = 0
+        elif sorted(self.mode) == ["b", "r"]:
+            start = self.tell()
+        else:
+            # The buffered data may not be written yet, or the size is given in characters.
+            return None
+        if size is None or size < 0:
+            # The size of a missing file is None, which will be raised by the sequential read.
+            file_size = self.raw_io.size
+            size = file_size - start if file_size is not None else 0
+        return start if size > self.PARALLEL_READ_THRESHOLD else None
+
+    def copy_multipart(self, dest_file, size):
+        """Copies this file to dest_file by reading ranges of this file
+        and uploading them as parts of a multipart upload concurrently.
+
+        Args:
+            dest_file: A StorageFile with raw_io supporting multipart uploads.
+            size: The size of this file in bytes.
+
+        Returns: The number of bytes copied.
+
+        Raises: ValueError if the parts would be larger than MULTIPART_COPY_MEMORY.
+            IOError if the source is modified during the copy, when its raw_io pins the ranged reads
+            to the version that gave the size (e.g. S3File).
+
+        """
+        raw = dest_file.raw_io
+        min_chunk_size = math.ceil(size / raw.MAX_UPLOAD_PARTS)
+        if min_chunk_size > self.MULTIPART_COPY_MEMORY:
+            raise ValueError(
+                "%s is too large to be copied in %s parts within the memory limit." % (self.uri, raw.MAX_UPLOAD_PARTS)
+            )
+        chunk_size = max(min(self.MULTIPART_COPY_CHUNK_SIZE, self.MULTIPART_COPY_MEMORY), min_chunk_size)
+        part_count = math.ceil(size / chunk_size)
+        # The number of parts held in memory at the same time.
+        max_workers = min(part_count, self.MULTIPART_COPY_MEMORY // chunk_size)
+
+        # Maps the part number to the uploaded part.
+        parts = dict()
+
+        def copy_part(i):
+            start = i * chunk_size
+            end = min(start + chunk_size, size) - 1
+            parts[i] = raw.upload_part(upload_id, i, self.read_range(start, end))
+
+        logger.debug("Copying %s to %s in %s parts..." % (self.uri, dest_file.uri, part_count))
+        upload_id = raw.create_multipart_upload()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(copy_part, i) for i in range(part_count)]
+                try:
+                    for future in futures:
+                        future.result()
+                except Exception:
+                    # Stop the parts not yet started, the running ones will be finished before aborting.
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except Exception:
+            raw.abort_multipart_upload(upload_id, list(parts.values()))
+            raise
+        parts = [parts[i] for i in range(part_count)]
+        raw.complete_multipart_upload(upload_id, parts)
+        return size
+
     def move(self, to):
         """Moves the objects to another location."""
-        self.copy(to)
         dest_file = StorageFile(to)
+        # Use raw_io move for same scheme, if possible
+        if self.scheme == dest_file.scheme and hasattr(self.raw_io, "move"):
+            if self.buffered_io:
+                self.buffered_io.close()
+            return self.raw_io.move(to)
+        self.copy(to)
         if dest_file.exists():
             self.delete()
         else:
@@ -892,7 +1270,11 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         """Determine if the file is gz compressed.
         """
         # Reset the offset to the beginning of the file if file is opened.
-        if self.closed:
+        if self.closed and isinstance(self.raw_io, CloudStorageIO):
+            # Request only the first 2 bytes, opening the file may prefetch the following chunks.
+            # An empty file cannot be requested with a range.
+            b = self.raw_io.read_bytes(0, 1) if self.size else b""
+        elif self.closed:
             with self.open("rb") as f:
                 b = f.read(2)
         else:
@@ -901,9 +1283,8 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
             b = self.read(2)
             # Move offset back
             self.seek(offset)
-        b = binascii.hexlify(b)
-        logger.debug("File begins with: %s" % b)
-        return b == b'1f8b'
+        logger.debug("File begins with: %r", b)
+        return b == GZIP_MAGIC
 
     def close(self):
         # logger.debug("Closing %s ..." % self.uri)
@@ -913,6 +1294,7 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
             results = self.buffered_io.close()
             # Remove the buffered_io reference so that it will close the raw IO
             self.buffered_io = None
+            self._unbind_io()
         elif self.raw_io and not self.raw_io.closed:
             self.raw_io.close()
         return results
@@ -929,6 +1311,12 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
         As a shortcut, read() can be called without initializing buffered_io
 
         """
+        start = self.__parallel_read_start(size)
+        if start is not None:
+            b = self.parallel_read(start, size)
+            if not self.closed:
+                self.seek(start + len(b))
+            return b
         # As a shortcut, read() can be called without initializing buffered_io
         if self.closed:
             # The returned content will always be bytes in this case.
@@ -949,9 +1337,8 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
             return
         b = s.encode(encoding, errors)
         if issubclass(self.raw_io.__class__, CloudStorageIO):
-            with BytesIO() as f:
-                f.write(b)
-                f.seek(0)
+            # BytesIO initialized with bytes shares the buffer until it is modified.
+            with BytesIO(b) as f:
                 self.raw_io.upload(f)
         elif self.closed:
             with self.raw_io.open('wb') as f:
@@ -964,8 +1351,10 @@ class StorageFile(StorageObject, BufferedIOWrapper, BufferedIOBase):
 
 
 class FileBatch(list):
-
-    BATCH_SIZE = 900
+    # S3 accepts at most 1000 keys in a DeleteObjects request.
+    BATCH_SIZE = 1000
+    # The number of S3 batch requests to be sent concurrently.
+    MAX_WORKERS = 16
 
     @property
     def scheme(self):
@@ -984,35 +1373,51 @@ class FileBatch(list):
         super().append(obj)
 
     def delete(self):
+        """Deletes the files. Files not found are ignored.
+        Google Cloud Storage files are deleted with individual requests sent concurrently, like GSPrefix.delete().
+        S3 files are deleted with DeleteObjects requests sent concurrently.
+        """
         blob_count = len(self)
         # logger.debug("Deleting %s files.." % blob_count)
-        i = 0
-        while i < len(self):
-            end = i + self.BATCH_SIZE
-            if end > len(self):
-                end = len(self)
-            batch = self[i:end]
-            i = end
-            if self.scheme == "gs" and batch:
-                self.delete_gs_batch(batch)
-            elif self.scheme == "s3" and batch:
-                self.delete_s3_batch(batch)
-            else:
-                raise UnsupportedOperation("Scheme %s is not supported." % self.scheme)
+        if not blob_count:
+            return
+        if self.scheme == "gs":
+            self.delete_gs(self)
+            logger.debug("Deleted %s files." % blob_count)
+            return
+        if self.scheme != "s3":
+            raise UnsupportedOperation("Scheme %s is not supported." % self.scheme)
+        # boto3 clients are thread-safe, one client is shared by the threads.
+        client = self[0].raw_io.client
+        batches = [self[i:i + self.BATCH_SIZE] for i in range(0, blob_count, self.BATCH_SIZE)]
+        # The batch requests are sent concurrently.
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(executor.map(lambda batch: self.delete_s3_batch(batch, client), batches))
         logger.debug("Deleted %s files." % blob_count)
 
     @staticmethod
-    def delete_gs_batch(batch):
-        if not len(batch):
-            return
-
-        client = storage.Client()
-
-        with client.batch():
-            for f in batch:
-                f.blob.delete()
+    def delete_gs(files):
+        """Deletes Google Cloud Storage files by sending individual requests concurrently.
+        Blobs not found are ignored, see GSPrefix.delete_parallel().
+        """
+        from .gs import GSPrefix
+        buckets = dict()
+        for f in files:
+            buckets.setdefault(f.raw_io.bucket_name, []).append(f)
+        for bucket_name, bucket_files in buckets.items():
+            bucket_prefix = GSPrefix("gs://%s/" % bucket_name)
+            # Blobs from the bucket are created without requesting the metadata.
+            bucket_prefix.delete_parallel(bucket_prefix.bucket.blob(f.raw_io.prefix) for f in bucket_files)
+            for f in bucket_files:
+                f.raw_io.invalidate()
 
     @staticmethod
-    def delete_s3_batch(batch):
-        bucket = batch[0].raw_io.bucket
-        bucket.delete_objects(Delete=dict(Objects=[{"Key": f.prefix} for f in batch], Quiet=True))
+    def delete_s3_batch(batch, client=None):
+        if client is None:
+            client = batch[0].raw_io.client
+        # A DeleteObjects request deletes the keys in a single bucket.
+        objects = dict()
+        for f in batch:
+            objects.setdefault(f.raw_io.bucket_name, []).append({"Key": f.raw_io.prefix})
+        for bucket_name, keys in objects.items():
+            client.delete_objects(Bucket=bucket_name, Delete=dict(Objects=keys, Quiet=True))
@@ -65,15 +65,49 @@ class S3Object(BucketStorageObject):
 class S3Prefix(CloudStoragePrefix, S3Object):
     @property
     def uri_list(self):
-        keys = []
-        response = self.client.list_objects(Bucket=self.bucket_name, Prefix=self.prefix, Delimiter='')
-        contents = response.get("Contents", [])
-        keys.extend([element.get("Key") for element in contents])
-        return [
-            "s3://%s/%s" % (self.bucket_name, key)
-            for key in keys
-            if not key.endswith("/")
-        ]
+        return list(self.iter_uris())
+
+    def iter_contents(self):
+        """Iterates through the listing of all objects with the prefix, including the ones in sub-folders.
+        The pages of the listing are requested as the iteration goes.
+
+        Returns: An iterator of dictionaries, each contains the "Key" and "Size" of an object.
+
+        """
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix):
+            yield from page.get("Contents", [])
+
+    def iter_uris(self):
+        """Iterates through the URIs of all objects with the prefix, including the ones in sub-folders.
+        """
+        for element in self.iter_contents():
+            key = element.get("Key")
+            if not key.endswith("/"):
+                yield "s3://%s/%s" % (self.bucket_name, key)
+
+    @property
+    def size(self):
+        """The size in bytes of all objects with the same prefix.
+        The sizes are summed from the listing, without requesting the metadata of each object.
+        """
+        return sum(int(element.get("Size") or 0) for element in self.iter_contents())
+
+    def iter_objects(self):
+        return self.iter_storage_files(self.iter_contents())
+
+    def iter_storage_files(self, contents):
+        """Yields a StorageFile for each element of a listing, skipping the "folder" keys.
+        The listed element is attached to the file, so that the metadata will not be requested again.
+        """
+        from .io import StorageFile
+        for element in contents:
+            key = element.get("Key")
+            if key.endswith("/"):
+                continue
+            storage_file = StorageFile("s3://%s/%s" % (self.bucket_name, key))
+            storage_file.raw_io.listing = element
+            yield storage_file
 
     def blobs(self, delimiter=""):
         return list(self.bucket.objects.filter(Prefix=self.prefix, Delimiter=delimiter))
@@ -88,73 +122,154 @@ class S3Prefix(CloudStoragePrefix, S3Object):
     def delete(self):
         return self.bucket.objects.filter(Prefix=self.prefix).delete()
 
+    def first_child(self):
+        """Gets the key of an object under the prefix, other than the object of the prefix itself, i.e. the "folder".
+        At most two keys are listed in a single request.
 
-class S3Folder(S3Prefix, StorageFolderBase):
-    def __init__(self, uri):
-        """Initializes a Google Cloud Storage Directory.
+        Returns: A key, or None if there is no object under the prefix.
+        """
+        response = self.client.list_objects_v2(Bucket=self.bucket_name, Prefix=self.prefix, MaxKeys=2)
+        for element in response.get("Contents", []):
+            if element.get("Key") != self.prefix:
+                return element.get("Key")
+        return None
 
-        Args:
-            uri: The path of the object, e.g. "gs://bucket_name/path/to/dir/".
+    def list_delimited(self):
+        """Lists the keys and the common prefixes directly under the prefix, using "/" as delimiter.
+        The keys in the sub-folders are rolled up into the common prefixes by S3,
+        so that only the immediate children are transferred.
+
+        Returns: A 2-tuple of (contents, prefixes).
+            Each element of the contents is a dictionary containing the "Key", "Size", "ETag" etc. of an object.
 
         """
-        # super() will call the __init__() of StorageObject, StorageFolder and GSObject
-        S3Object.__init__(self, uri)
-        StorageFolderBase.__init__(self, uri)
+        contents = []
+        prefixes = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix, Delimiter='/'):
+            contents.extend(page.get("Contents", []))
+            prefixes.extend([p.get("Prefix") for p in page.get("CommonPrefixes", []) if p.get("Prefix")])
+        return contents, prefixes
+
+    def list_prefixes(self):
+        """Gets the prefixes of the sub-folders, i.e. the keys end with "/" after the prefix.
+
+        Returns: A set of prefixes.
+        """
+        return set(self.list_delimited()[1])
 
-        # Make sure prefix ends with "/", otherwise it is not a "folder"
-        if self.prefix and not self.prefix.endswith("/"):
-            self.prefix += "/"
+    def scan(self):
+        """Lists the files and the sub-folders with a single delimited listing.
+        The listed elements are attached to the files, so that the metadata will not be requested again.
+
+        Returns: A 2-tuple of (files, folders), a list of StorageFiles and a list of StorageFolders.
+        """
+        from .io import StorageFolder
+        contents, prefixes = self.list_delimited()
+        files = list(self.iter_storage_files(contents))
+        folders = [StorageFolder("s3://%s/%s" % (self.bucket_name, p)) for p in prefixes]
+        return files, folders
 
     @property
     def folder_paths(self):
         """Folders(Directories) in the directory.
         """
-        return self.__folders_paths()
-
-    def __folders_paths(self):
-        # TODO: Get the next page
-        folders = []
-        response = self.client.list_objects(Bucket=self.bucket_name, Prefix=self.prefix, Delimiter='/')
-        prefixes = response.get("CommonPrefixes", [])
-        folders.extend([p.get('Prefix') for p in prefixes if p.get('Prefix')])
         return [
             "s3://%s/%s" % (self.bucket_name, p)
-            for p in folders
+            for p in self.list_delimited()[1]
         ]
 
     @property
     def file_paths(self):
         """Files in the directory
         """
-        paths = self.__file_paths()
-        return paths
+        return [
+            "s3://%s/%s" % (self.bucket_name, element.get("Key"))
+            for element in self.list_delimited()[0]
+            if not element.get("Key").endswith("/")
+        ]
+
+    @property
+    def files(self):
+        return list(self.iter_storage_files(self.list_delimited()[0]))
+
+    @property
+    def folders(self):
+        from .io import StorageFolder
+        return [StorageFolder(p) for p in self.folder_paths]
+
+
+class S3Folder(S3Prefix, StorageFolderBase):
+    def __init__(self, uri):
+        """Initializes a Google Cloud Storage Directory.
+
+        Args:
+            uri: The path of the object, e.g. "gs://bucket_name/path/to/dir/".
+
+        """
+        # super() will call the __init__() of StorageObject, StorageFolder and GSObject
+        S3Object.__init__(self, uri)
+        StorageFolderBase.__init__(self, uri)
+
+        # Make sure prefix ends with "/", otherwise it is not a "folder"
+        if self.prefix and not self.prefix.endswith("/"):
+            self.prefix += "/"
 
-    def __file_paths(self):
-        keys = []
-        response = self.client.list_objects(Bucket=self.bucket_name, Prefix=self.prefix, Delimiter='/')
-        contents = response.get("Contents", [])
-        keys.extend([element.get("Key") for element in contents])
+    def filter_files(self, prefix):
+        """Lists the files in the folder with names starting with prefix.
+        The prefix is sent with the listing request, so that only the matching keys are listed.
+        """
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix + prefix, Delimiter='/')
         return [
-            "s3://%s/%s" % (self.bucket_name, key)
-            for key in keys
-            if not key.endswith("/")
+            S3File("s3://%s/%s" % (self.bucket_name, element.get("Key")))
+            for page in pages
+            for element in page.get("Contents", [])
+            if not element.get("Key").endswith("/")
         ]
 
 
 class S3File(S3Object,CloudStorageIO):
+    # S3 allows at most 10,000 parts in a multipart upload.
+    MAX_UPLOAD_PARTS = 10000
+
     def __init__(self, uri):
         # file_io will be initialized by open()
         # self.file_io = None
         S3Object.__init__(self, uri)
         CloudStorageIO.__init__(self, uri)
+        # The element of the listing response, if the file is created from a listing.
+        # The metadata in the listing is used instead of sending a HEAD request for the object.
+        self.listing = None
+        # The ETag of the object version that gave the size, see get_size().
+        # Ranged reads are pinned to this version, so that the ranges of a file read or copied in parallel
+        # will not come from different versions of the object.
+        self.e_tag = None
+
+    def invalidate(self):
+        """Discards the listing and the ETag of this object, after the object is changed or deleted.
+        """
+        self.listing = None
+        self.e_tag = None
+
+    def listed(self, key):
+        """Gets a value from the listing response, or None if the file is not created from a listing.
+        """
+        if self.listing:
+            return self.listing.get(key)
+        return None
 
     @property
     def updated_time(self):
+        last_modified = self.listed("LastModified")
+        if last_modified is not None:
+            return last_modified
         return self.blob.last_modified
 
     @property
     def md5_hex(self):
-        e_tag = str(self.blob.e_tag)
+        e_tag = self.listed("ETag") or self.blob.e_tag
+        e_tag = str(e_tag)
         if len(e_tag) > 2:
             e_tag = e_tag.strip("\"")
         if "-" not in e_tag:
@@ -162,24 +277,99 @@ class S3File(S3Object,CloudStorageIO):
         return None
 
     def get_size(self):
-        return self.blob.content_length
+        """Gets the size of the object, or None if the object does not exist.
+        """
+        size = self.listed("Size")
+        if size is not None:
+            self.e_tag = self.listed("ETag")
+            return int(size)
+        try:
+            response = self.client.head_object(Bucket=self.bucket_name, Key=self.prefix)
+        except ClientError as e:
+            if e.response['Error']['Code'] == '404':
+                return None
+            raise e
+        self.e_tag = response.get("ETag")
+        return response.get("ContentLength")
 
     def upload(self, from_file_obj):
         self.blob.upload_fileobj(from_file_obj)
+        self.invalidate()
 
     def download(self, to_file_obj):
         self.blob.download_fileobj(to_file_obj)
         return to_file_obj
 
     def read_bytes(self, start, end):
-        response = self.blob.get(Range="bytes=%s-%s" % (start, end))
+        """Reads the bytes from start to end (inclusive) of the object.
+        The request is pinned to the version that gave the size, if the size is known.
+
+        Raises: IOError if the object has been modified since the size was obtained.
+
+        """
+        kwargs = dict(Bucket=self.bucket_name, Key=self.prefix, Range="bytes=%s-%s" % (start, end))
+        if self.e_tag:
+            kwargs["IfMatch"] = self.e_tag
+        try:
+            response = self.client.get_object(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', '412'):
+                raise IOError("%s has been modified while being read." % self.uri) from e
+            raise e
         content = response.get("Body")
         if content:
             data = content.read()
             return data
-        return ""
+        return b""
+
+    def create_multipart_upload(self):
+        """Starts a multipart upload for this file.
+
+        Returns: The upload ID.
+
+        See Also:
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/create_multipart_upload.html
+        """
+        response = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=self.prefix)
+        return response["UploadId"]
+
+    def upload_part(self, upload_id, part_number, data):
+        """Uploads the bytes of one part. The part number starts from 0.
+
+        Returns: The part, to be passed to complete_multipart_upload().
+
+        """
+        # S3 part numbers start from 1.
+        response = self.client.upload_part(
+            Bucket=self.bucket_name, Key=self.prefix, UploadId=upload_id,
+            PartNumber=part_number + 1, Body=data
+        )
+        return dict(ETag=response["ETag"], PartNumber=part_number + 1)
+
+    def complete_multipart_upload(self, upload_id, parts):
+        self.invalidate()
+        return self.client.complete_multipart_upload(
+            Bucket=self.bucket_name, Key=self.prefix, UploadId=upload_id,
+            MultipartUpload=dict(Parts=parts)
+        )
+
+    def abort_multipart_upload(self, upload_id, parts):
+        return self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.prefix, UploadId=upload_id)
+
+    def delete(self):
+        response = S3Object.delete(self)
+        self.invalidate()
+        return response
 
     def copy(self, to):
-        dest = S3File(to)
-        logger.debug("Creating copy of S3 file at %s" % to)
-        return dest.blob.copy(dict(Bucket=self.bucket_name, Key=self.prefix))
+        """Copies the object to another location.
+
+        Args:
+            to: URI of the destination (s3://...), or an S3File initialized with the URI.
+
+        """
+        dest = to if isinstance(to, S3File) else S3File(to)
+        logger.debug("Creating copy of S3 file at %s" % dest.uri)
+        response = dest.blob.copy(dict(Bucket=self.bucket_name, Key=self.prefix))
+        dest.invalidate()
+        return response
@@ -1,11 +1,15 @@
 """Contains tests for the storage package.
 """
 import datetime
+import errno
 import logging
 import os
+import shutil
 import sys
+import tempfile
 import time
 import traceback
+from unittest import mock
 logger = logging.getLogger(__name__)
 
 
@@ -125,6 +129,34 @@ class TestStorage(AriesTest):
             self.assertIn(os.path.join(self.TEST_ROOT, "test_folder_0/"), sub_folders)
             self.assertIn(os.path.join(self.TEST_ROOT, "test_folder_1/"), sub_folders)
 
+    def test_scan(self):
+        files, folders = StorageFolder(self.TEST_ROOT).scan()
+        self.assertEqual([f.basename for f in files], ["file_in_test_folder"])
+        self.assertEqual(sorted(f.basename for f in folders), ["test_folder_0", "test_folder_1"])
+        self.assertTrue(all(isinstance(f, StorageFile) for f in files))
+        self.assertTrue(all(isinstance(f, StorageFolder) for f in folders))
+        # Scanning again gives the same results
+        self.assertEqual(len(self.test_folder.scan()[1]), 2)
+        self.assertEqual(len(self.test_folder.scan()[1]), 2)
+
+    def test_cache_listing(self):
+        folder_uri = os.path.join(self.TEST_ROOT, "test_folder_cache")
+        self.create_file("test_folder_cache/a.txt", "a")
+        try:
+            folder = StorageFolder(folder_uri)
+            cached_folder = StorageFolder(folder_uri, cache_listing=True)
+            self.assertEqual(folder.file_names, ["a.txt"])
+            self.assertEqual(cached_folder.file_names, ["a.txt"])
+            self.create_file("test_folder_cache/b.txt", "b")
+            # The listing is not cached by default.
+            self.assertEqual(sorted(folder.file_names), ["a.txt", "b.txt"])
+            self.assertIsNotNone(folder.get_file("b.txt"))
+            # The cached listing is used until refresh() is called.
+            self.assertEqual(cached_folder.file_names, ["a.txt"])
+            self.assertEqual(sorted(cached_folder.refresh().file_names), ["a.txt", "b.txt"])
+        finally:
+            StorageFolder(folder_uri).delete()
+
     def test_get_folder_and_file(self):
         # Try to get a folder that does not exist. Should return None
         self.assertIsNone(self.test_folder.get_folder("not_exist"))
@@ -192,6 +224,39 @@ class TestStorage(AriesTest):
         storage_file.delete()
         self.assertFalse(storage_file.exists())
 
+    def test_iterate_lines(self):
+        storage_file = StorageFile(os.path.join(self.TEST_ROOT, "test_folder_0", "abc.txt"))
+        for mode, lines in (("r", ["abc\n", "cba\n"]), ("rb", [b"abc\n", b"cba\n"])):
+            # The lines are iterated again after the file is closed and re-opened.
+            for _ in range(2):
+                storage_file.open(mode)
+                self.assertEqual(list(storage_file), lines)
+                storage_file.seek(0)
+                self.assertEqual(storage_file.readline(), lines[0])
+                self.assertEqual(next(storage_file), lines[1])
+                storage_file.seek(0)
+                self.assertEqual(storage_file.readlines(), lines)
+                storage_file.close()
+                # The methods bound to the buffered IO are removed when the file is closed.
+                with self.assertRaises(ValueError):
+                    storage_file.readline()
+                with self.assertRaises(ValueError):
+                    list(storage_file)
+
+    def test_reopen_modified_file(self):
+        file_uri = os.path.join(self.TEST_ROOT, "reopen.txt")
+        self.create_file("reopen.txt", "old content")
+        storage_file = StorageFile(file_uri).open("rb")
+        try:
+            self.assertEqual(storage_file.read(3), b"old")
+            # Modify the file while it is open, re-opening it should read the new content.
+            self.create_file("reopen.txt", "new content!!")
+            storage_file.open("rb")
+            self.assertEqual(storage_file.read(), b"new content!!")
+        finally:
+            storage_file.close()
+            storage_file.delete()
+
     def test_copy_folder(self):
         # Source folder to be copied
         src_folder_uri = os.path.join(self.TEST_ROOT, "test_folder_0")
@@ -321,3 +386,77 @@ class TestStorageAWS(TestStorageWithCredentials):
             print("%s: %s" % (type(ex), str(ex)))
             traceback.print_exc()
             raise ex
+
+
+class TestLocalStorage(AriesTest):
+    """Contains tests for the features specific to local files and folders.
+    """
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def create_file(self, relative_path, content):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_folder_size_with_symlinks(self):
+        self.create_file("a.txt", "abc")
+        self.create_file("sub/b.txt", "12345")
+        self.assertEqual(StorageFolder(self.root).size, 8)
+        # Links to the sub-folder and to the folder itself are not followed.
+        os.symlink(os.path.join(self.root, "sub"), os.path.join(self.root, "link_to_sub"))
+        os.symlink(self.root, os.path.join(self.root, "sub", "loop"))
+        links = [os.path.join(self.root, "link_to_sub"), os.path.join(self.root, "sub", "loop")]
+        self.assertEqual(StorageFolder(self.root).size, 8 + sum(os.lstat(p).st_size for p in links))
+
+    def test_copy_file_range(self):
+        copy_file_range = getattr(os, "copy_file_range", None)
+        if copy_file_range is None:
+            self.skipTest("os.copy_file_range() is not available.")
+        src_path = self.create_file("src.txt", "abc\ncba\n")
+        dst_path = os.path.join(self.root, "sub", "dst.txt")
+        os.makedirs(os.path.dirname(dst_path))
+        # The data is copied by the kernel, shutil.copyfile() is not used.
+        with mock.patch.object(os, "copy_file_range", wraps=copy_file_range) as kernel_copy, \
+                mock.patch.object(shutil, "copyfile", wraps=shutil.copyfile) as copyfile:
+            StorageFile(src_path).copy(dst_path)
+        kernel_copy.assert_called()
+        copyfile.assert_not_called()
+        with open(dst_path) as f:
+            self.assertEqual(f.read(), "abc\ncba\n")
+
+    def test_copy_file_range_fallback(self):
+        src_path = self.create_file("src.txt", "abc\ncba\n")
+        dst_path = os.path.join(self.root, "dst.txt")
+        for error_number in (errno.EXDEV, errno.ENOSYS, errno.EINVAL):
+            if os.path.exists(dst_path):
+                os.remove(dst_path)
+            error = OSError(error_number, os.strerror(error_number))
+            # The file is copied by shutil.copyfile() if copy_file_range() is not supported.
+            with mock.patch.object(os, "copy_file_range", create=True, side_effect=error), \
+                    mock.patch.object(shutil, "copyfile", wraps=shutil.copyfile) as copyfile:
+                StorageFile(src_path).copy(dst_path)
+            copyfile.assert_called_once()
+            with open(dst_path) as f:
+                self.assertEqual(f.read(), "abc\ncba\n")
+        # Other errors are raised.
+        error = OSError(errno.EIO, os.strerror(errno.EIO))
+        with mock.patch.object(os, "copy_file_range", create=True, side_effect=error):
+            with self.assertRaises(OSError):
+                StorageFile(src_path).copy(dst_path)
+
+    def test_copy_to_same_file(self):
+        src_path = self.create_file("src.txt", "abc\ncba\n")
+        with self.assertRaises(shutil.SameFileError):
+            StorageFile(src_path).copy(src_path)
+        # The source is not truncated.
+        with open(src_path) as f:
+            self.assertEqual(f.read(), "abc\ncba\n")
@@ -0,0 +1,438 @@
+"""Contains tests for the cloud storage IO, using an in-memory cloud storage.
+"""
+import gc
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from unittest import mock
+logger = logging.getLogger(__name__)
+try:
+    from ..test import AriesTest
+    from ..storage import StorageFile
+    from ..storage.cloud import CloudStorageIO, PrefetchReader
+    from ..storage.gs import GSFile, GSPrefix
+    from ..storage.s3 import S3File
+except:
+    aries_parent = os.path.join(os.path.dirname(__file__), "..", "..")
+    if aries_parent not in sys.path:
+        sys.path.append(aries_parent)
+    from Aries.test import AriesTest
+    from Aries.storage import StorageFile
+    from Aries.storage.cloud import CloudStorageIO, PrefetchReader
+    from Aries.storage.gs import GSFile, GSPrefix
+    from Aries.storage.s3 import S3File
+
+
+class MemoryFile(CloudStorageIO):
+    """A cloud storage file kept in memory, recording the ranges requested by read_bytes().
+    """
+    PREFETCH_CHUNK_SIZE = 16
+    PREFETCH_DEPTH = 2
+    # Maps the URI to the content of the files.
+    blobs = dict()
+    # The (start, end) of the ranged reads, inclusive.
+    reads = []
+
+    def exists(self):
+        return self.uri in self.blobs
+
+    def get_size(self):
+        data = self.blobs.get(self.uri)
+        return None if data is None else len(data)
+
+    def read_bytes(self, start, end):
+        self.reads.append((start, end))
+        return self.blobs[self.uri][start:end + 1]
+
+    def upload(self, from_file_obj):
+        self.blobs[self.uri] = from_file_obj.read()
+
+    def download(self, to_file_obj):
+        if self.uri not in self.blobs:
+            raise FileNotFoundError("File %s not found." % self.uri)
+        to_file_obj.write(self.blobs[self.uri])
+        return to_file_obj
+
+    def delete(self):
+        self.blobs.pop(self.uri, None)
+
+
+class MemoryMultipartFile(MemoryFile):
+    """An in-memory cloud storage file supporting multipart uploads.
+    """
+    MAX_UPLOAD_PARTS = 4
+    # The sizes of the parts uploaded by upload_part().
+    part_sizes = []
+
+    def create_multipart_upload(self):
+        return "upload"
+
+    def upload_part(self, upload_id, part_number, data):
+        self.part_sizes.append(len(data))
+        return part_number, bytes(data)
+
+    def complete_multipart_upload(self, upload_id, parts):
+        self.blobs[self.uri] = b"".join(data for _, data in parts)
+
+    def abort_multipart_upload(self, upload_id, parts):
+        pass
+
+
+class SlowMemoryFile(MemoryFile):
+    """An in-memory cloud storage file with hedged reads, each read_bytes() call sleeps for a given delay.
+    """
+    HEDGE_READS = True
+    HEDGE_MIN_SAMPLES = 5
+    # The delays of the following read_bytes() calls in seconds.
+    delays = []
+
+    def read_bytes(self, start, end):
+        time.sleep(self.delays.pop(0) if self.delays else 0)
+        return MemoryFile.read_bytes(self, start, end)
+
+
+def mock_s3_client(stored):
+    """Mocks the S3 client for an object, which is stored as a 2-tuple of (ETag, content) in stored["data"].
+    The GET requests with an IfMatch not matching the ETag fail with 412.
+    """
+    from botocore.exceptions import ClientError
+
+    def get_object(Bucket, Key, Range, IfMatch=None):
+        e_tag, content = stored["data"]
+        if IfMatch is not None and IfMatch != e_tag:
+            raise ClientError(dict(Error=dict(Code="PreconditionFailed")), "GetObject")
+        start, end = [int(i) for i in Range[len("bytes="):].split("-")]
+        return dict(Body=io.BytesIO(content[start:end + 1]))
+
+    client = mock.MagicMock()
+    client.head_object.side_effect = lambda **kwargs: dict(
+        ContentLength=len(stored["data"][1]), ETag=stored["data"][0]
+    )
+    client.get_object.side_effect = get_object
+    return client
+
+
+class TestCloudStorageIO(AriesTest):
+    CONTENT = bytes(range(256)) * 4
+    URI = "mem://bucket/data.bin"
+
+    def setUp(self):
+        super().setUp()
+        StorageFile.registry["mem"] = MemoryFile
+        MemoryFile.blobs[self.URI] = self.CONTENT
+        MemoryFile.reads.clear()
+        self.threads_before = threading.enumerate()
+
+    def tearDown(self):
+        MemoryFile.blobs.clear()
+        StorageFile.registry.pop("mem", None)
+        StorageFile.registry.pop("memparts", None)
+        CloudStorageIO.read_durations.clear()
+        super().tearDown()
+
+    def test_prefetch_reader(self):
+        reader = PrefetchReader(lambda start, end: self.CONTENT[start:end + 1], 10, 1000, 64, 2)
+        # Small reads within a chunk and across the chunks
+        self.assertEqual(reader.read(1), self.CONTENT[10:11])
+        self.assertEqual(reader.read(100), self.CONTENT[11:111])
+        self.assertEqual(reader.offset, 111)
+        self.assertEqual(reader.read(), self.CONTENT[111:1001])
+        self.assertEqual(reader.read(10), b"")
+        reader.thread.join(5)
+        self.assertFalse(reader.thread.is_alive())
+
+    def test_prefetch_reader_error(self):
+        def read_bytes(start, end):
+            if start > 0:
+                raise ValueError("Failed to read.")
+            return self.CONTENT[start:end + 1]
+
+        reader = PrefetchReader(read_bytes, 0, 100, 10, 2)
+        self.assertEqual(reader.read(10), self.CONTENT[:10])
+        with self.assertRaises(ValueError):
+            reader.read(10)
+
+    def test_sequential_read(self):
+        raw = MemoryFile(self.URI)
+        raw.open("rb")
+        data = []
+        while True:
+            b = raw.read(10)
+            if not b:
+                break
+            data.append(b)
+        raw.close()
+        self.assertEqual(b"".join(data), self.CONTENT)
+        # The first read is a direct read, the others are served by the prefetched chunks.
+        self.assertEqual(MemoryFile.reads[0], (0, 9))
+        self.assertTrue(all(end - start + 1 == MemoryFile.PREFETCH_CHUNK_SIZE for start, end in MemoryFile.reads[1:-1]))
+
+    def test_seek_away(self):
+        raw = MemoryFile(self.URI)
+        raw.open("rb")
+        raw.read(10)
+        raw.read(10)
+        raw.seek(500)
+        self.assertEqual(raw.read(10), self.CONTENT[500:510])
+        raw.seek(5)
+        self.assertEqual(raw.read(5), self.CONTENT[5:10])
+        self.assertEqual(raw.read(20), self.CONTENT[10:30])
+        raw.close()
+
+    def test_unclosed_file(self):
+        raw = MemoryFile(self.URI)
+        raw.open("rb")
+        raw.read(10)
+        raw.read(10)
+        threads = [t for t in threading.enumerate() if t not in self.threads_before]
+        self.assertTrue(threads, "Prefetching is not started.")
+        raw_ref = weakref.ref(raw)
+        del raw
+        gc.collect()
+        self.assertIsNone(raw_ref(), "The prefetching thread keeps the file alive.")
+        # The thread stops within the timeout of putting a chunk into the queue.
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+    def test_copy_to_local(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_path = os.path.join(temp_dir, "sub", "data.bin")
+            self.assertEqual(StorageFile(self.URI).copy(local_path), len(self.CONTENT))
+            with open(local_path, "rb") as f:
+                self.assertEqual(f.read(), self.CONTENT)
+            # The destination should not be created if the source does not exist.
+            missing_path = os.path.join(temp_dir, "missing.bin")
+            with self.assertRaises(FileNotFoundError):
+                StorageFile("mem://bucket/missing.bin").copy(missing_path)
+            self.assertFalse(os.path.exists(missing_path))
+
+    def test_copy_to_relative_path(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.chdir(temp_dir)
+            try:
+                StorageFile(self.URI).copy("data.bin")
+                self.assertEqual(os.path.getsize("data.bin"), len(self.CONTENT))
+            finally:
+                os.chdir(cwd)
+
+    def test_parallel_read(self):
+        with mock.patch.object(StorageFile, "PARALLEL_READ_THRESHOLD", 100), \
+                mock.patch.object(StorageFile, "PARALLEL_READ_CHUNK_SIZE", 300):
+            # The read spans several chunks, the last one is shorter.
+            b = StorageFile(self.URI).read()
+            self.assertIsInstance(b, bytes)
+            self.assertEqual(b, self.CONTENT)
+            self.assertEqual(sorted(MemoryFile.reads), [(0, 299), (300, 599), (600, 899), (900, 1023)])
+            # Reading with size from an open file moves the position.
+            with StorageFile(self.URI).open("rb") as f:
+                f.read(10)
+                self.assertEqual(f.read(500), self.CONTENT[10:510])
+                self.assertEqual(f.tell(), 510)
+                self.assertEqual(f.read(), self.CONTENT[510:])
+            # Missing file, with and without the size.
+            with self.assertRaises(FileNotFoundError):
+                StorageFile("mem://bucket/missing.bin").read(1000)
+            with self.assertRaises(FileNotFoundError):
+                StorageFile("mem://bucket/missing.bin").read()
+
+    def test_copy_multipart(self):
+        StorageFile.registry["memparts"] = MemoryMultipartFile
+        MemoryMultipartFile.part_sizes.clear()
+        with mock.patch.object(StorageFile, "MULTIPART_COPY_THRESHOLD", 100), \
+                mock.patch.object(StorageFile, "MULTIPART_COPY_CHUNK_SIZE", 100), \
+                mock.patch.object(StorageFile, "MULTIPART_COPY_MEMORY", 300):
+            # The parts are larger than the chunk size, as there are at most 4 parts.
+            StorageFile(self.URI).copy("memparts://bucket/copy.bin")
+            self.assertEqual(MemoryFile.blobs["memparts://bucket/copy.bin"], self.CONTENT)
+            self.assertEqual(MemoryMultipartFile.part_sizes, [256] * 4)
+            # The parts would be larger than the memory limit, the file is copied as a stream.
+            MemoryMultipartFile.part_sizes.clear()
+            MemoryFile.blobs[self.URI] = self.CONTENT * 2
+            StorageFile(self.URI).copy("memparts://bucket/copy.bin")
+            self.assertEqual(MemoryFile.blobs["memparts://bucket/copy.bin"], self.CONTENT * 2)
+            self.assertEqual(MemoryMultipartFile.part_sizes, [])
+
+    def test_copy_multipart_modified(self):
+        StorageFile.registry["memparts"] = MemoryMultipartFile
+        stored = dict(data=("\"v1\"", self.CONTENT))
+        client = mock_s3_client(stored)
+        get_object = client.get_object.side_effect
+
+        def modify_after_read(**kwargs):
+            # The source is overwritten after the first part is read.
+            response = get_object(**kwargs)
+            stored["data"] = ("\"v2\"", b"0" * len(self.CONTENT))
+            return response
+
+        client.get_object.side_effect = modify_after_read
+        MemoryFile.blobs.pop("memparts://bucket/copy.bin", None)
+        with mock.patch.object(S3File, "client", client), \
+                mock.patch.object(MemoryMultipartFile, "abort_multipart_upload") as abort, \
+                mock.patch.object(StorageFile, "MULTIPART_COPY_THRESHOLD", 100), \
+                mock.patch.object(StorageFile, "MULTIPART_COPY_CHUNK_SIZE", 100), \
+                mock.patch.object(StorageFile, "MULTIPART_COPY_MEMORY", 300):
+            # The parts are pinned to the version of the source, the copy is aborted.
+            with self.assertRaises(IOError):
+                StorageFile("s3://bucket/data.bin").copy("memparts://bucket/copy.bin")
+            abort.assert_called_once()
+        self.assertNotIn("memparts://bucket/copy.bin", MemoryFile.blobs)
+
+    def test_gs_read_bytes(self):
+        def download_to_file(writer, start, end, **kwargs):
+            # The response is streamed in chunks of different types.
+            writer.write(self.CONTENT[start:start + 10])
+            writer.write(bytearray(self.CONTENT[start + 10:end + 1]))
+            writer.write(memoryview(self.CONTENT[end + 1:end + 6]))
+
+        blob = mock.MagicMock()
+        blob.download_to_file.side_effect = download_to_file
+        with mock.patch.object(GSFile, "blob", blob):
+            b = GSFile("gs://bucket/data.bin").read_bytes(100, 199)
+        self.assertIsInstance(b, bytes)
+        # The buffer grows if the server returns more data than expected.
+        self.assertEqual(b, self.CONTENT[100:205])
+
+    def test_gs_blob_metadata(self):
+        # The blobs stored in the bucket, mapping the name to the content.
+        stored = dict()
+
+        def get_blob(name):
+            if name not in stored:
+                return None
+            return mock.MagicMock(generation=hash(stored[name]), size=len(stored[name]))
+
+        def new_blob(name, **kwargs):
+            blob = mock.MagicMock(generation=None)
+            blob.upload_from_file.side_effect = lambda f, **kw: stored.__setitem__(name, f.read())
+            return blob
+
+        bucket = mock.MagicMock()
+        bucket.get_blob.side_effect = get_blob
+        bucket.blob.side_effect = new_blob
+        uri = "gs://bucket/data.bin"
+        with mock.patch.object(GSFile, "bucket", bucket):
+            stored["data.bin"] = b"12345"
+            self.assertEqual(GSFile(uri).get_size(), 5)
+            # Overwrite the blob through a second instance.
+            GSFile(uri).upload(io.BytesIO(b"12345678"))
+            self.assertEqual(GSFile(uri).get_size(), 8)
+            # Overwritten by another process, the metadata is not shared by default.
+            stored["data.bin"] = b"123"
+            self.assertEqual(GSFile(uri).get_size(), 3)
+
+    def test_delete_many(self):
+        from google.cloud.exceptions import NotFound
+        # The names of the blobs stored in the GCS bucket.
+        stored = {"a.txt", "b.txt"}
+
+        def delete_blob(name):
+            if name not in stored:
+                raise NotFound("Blob %s not found." % name)
+            stored.remove(name)
+
+        def new_blob(name, **kwargs):
+            blob = mock.MagicMock()
+            blob.name = name
+            blob.delete.side_effect = lambda **kw: delete_blob(name)
+            return blob
+
+        bucket = mock.MagicMock()
+        bucket.blob.side_effect = new_blob
+        s3_client = mock.MagicMock()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_path = os.path.join(temp_dir, "local.txt")
+            with open(local_path, "w") as f:
+                f.write("local")
+            with mock.patch.object(GSPrefix, "bucket", bucket), mock.patch.object(S3File, "client", s3_client):
+                # The files not found are ignored, for all schemes.
+                StorageFile.delete_many([
+                    "gs://bucket/a.txt", "gs://bucket/b.txt", "gs://bucket/missing.txt",
+                    StorageFile("s3://bucket/a.txt"), "s3://bucket/missing.txt",
+                    local_path, os.path.join(temp_dir, "missing.txt"),
+                ])
+            self.assertFalse(os.path.exists(local_path))
+        self.assertEqual(stored, set())
+        s3_client.delete_objects.assert_called_once_with(Bucket="bucket", Delete=dict(
+            Objects=[{"Key": "a.txt"}, {"Key": "missing.txt"}], Quiet=True
+        ))
+
+    def test_s3_read_bytes(self):
+        # The object stored in the bucket, as a 2-tuple of (ETag, content).
+        stored = dict(data=("\"v1\"", self.CONTENT))
+        client = mock_s3_client(stored)
+        with mock.patch.object(S3File, "client", client):
+            raw = S3File("s3://bucket/data.bin")
+            # The size and the ETag are obtained from the same HEAD request.
+            self.assertEqual(raw.size, len(self.CONTENT))
+            self.assertEqual(raw.read_bytes(100, 199), self.CONTENT[100:200])
+            self.assertEqual(client.get_object.call_args[1].get("IfMatch"), "\"v1\"")
+            # The object is modified between the ranged reads.
+            stored["data"] = ("\"v2\"", b"0" * len(self.CONTENT))
+            with self.assertRaises(IOError):
+                raw.read_bytes(200, 299)
+            # The reads are not pinned if the size is not obtained.
+            self.assertEqual(S3File("s3://bucket/data.bin").read_bytes(0, 9), b"0" * 10)
+
+    def test_s3_listing(self):
+        stored = dict(data=("\"v1\"", self.CONTENT))
+        client = mock_s3_client(stored)
+        blob = mock.MagicMock()
+        listing = dict(Key="data.bin", Size=len(self.CONTENT), ETag="\"v1\"")
+        with mock.patch.object(S3File, "client", client), mock.patch.object(S3File, "blob", blob):
+            raw = S3File("s3://bucket/data.bin")
+            # The metadata is taken from the listing, without a HEAD request.
+            raw.listing = listing
+            self.assertEqual(raw.get_size(), len(self.CONTENT))
+            client.head_object.assert_not_called()
+            # The listing is discarded when the file is changed or deleted.
+            stored["data"] = ("\"v2\"", b"123")
+            for change in (
+                lambda: raw.upload(io.BytesIO(b"123")),
+                lambda: raw.complete_multipart_upload("upload", []),
+                lambda: S3File("s3://bucket/source.bin").copy(raw),
+                lambda: raw.delete(),
+            ):
+                raw.listing = listing
+                change()
+                self.assertIsNone(raw.listing)
+                self.assertEqual(raw.get_size(), 3)
+            # Writing the file through close() uploads it.
+            raw.listing = listing
+            raw.open("wb")
+            raw.write(b"123")
+            raw.close()
+            self.assertIsNone(raw.listing)
+            self.assertEqual(raw.get_size(), 3)
+
+    def test_hedged_read(self):
+        raw = SlowMemoryFile(self.URI)
+        for i in range(5):
+            self.assertEqual(raw.hedged_read_bytes(i * 16, i * 16 + 15), self.CONTENT[i * 16:i * 16 + 16])
+        # The durations are kept for each class and size bucket.
+        self.assertEqual(len(raw.get_read_durations(16)), 5)
+        self.assertEqual(len(raw.get_read_durations(1)), 0)
+        self.assertEqual(len(MemoryFile.get_read_durations(16)), 0)
+        # The first request is slow, the data is returned by the hedged request.
+        MemoryFile.reads.clear()
+        SlowMemoryFile.delays[:] = [1, 0]
+        started = time.monotonic()
+        self.assertEqual(raw.hedged_read_bytes(100, 115), self.CONTENT[100:116])
+        self.assertLess(time.monotonic() - started, 0.5)
+        # The recorded duration is the one of the hedged request, excluding the time waiting before hedging.
+        self.assertLess(raw.get_read_durations(16)[-1], 0.5)
+        # The thread pool can be shut down, the running request will finish in the background.
+        threads = [t for t in threading.enumerate() if t not in self.threads_before]
+        self.assertTrue(threads)
+        CloudStorageIO.shutdown_hedge_executor()
+        self.assertIsNone(CloudStorageIO.hedge_executor)
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(MemoryFile.reads, [(100, 115), (100, 115)])